@@ -16,6 +16,7 @@ from dotenv import load_dotenv
 import time
 from datetime import datetime
 import logging
+import re
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent))
@@ -30,6 +31,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Citation markers [1], [2], ... in answers, and the superscript link each becomes
+_CITATION_RE = re.compile(r'\[(\d+)\]')
+_CITATION_LINK = r'<sup><a href="#citation-\1" style="color: #007bff; text-decoration: none; font-weight: bold;">[\1]</a></sup>'
+
 # ============================================================================
 # PAGE CONFIGURATION
 # ============================================================================
@@ -309,12 +314,7 @@ def render_message(message: dict):
         answer_html = content
         
         # Convert citation markers [1], [2], etc. to styled superscript links
-        import re
-        def replace_citation(match):
-            num = match.group(1)
-            return f'<sup><a href="#citation-{num}" style="color: #007bff; text-decoration: none; font-weight: bold;">[{num}]</a></sup>'
-        
-        answer_html = re.sub(r'\[(\d+)\]', replace_citation, answer_html)
+        answer_html = _CITATION_RE.sub(_CITATION_LINK, answer_html)
         
         # Render answer
         st.markdown(f"""
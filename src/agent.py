@@ -9,12 +9,47 @@ from src.database import Database
 from src.rag_engine import MultiCompanyStockAnalyzer
 from src.tools import ToolsFactory
 from typing import Optional, Dict
+from dataclasses import asdict
 from langfuse.decorators import observe, langfuse_context
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+# System prompt for the agent (static, so built once)
+SYSTEM_PROMPT = """You are a financial analysis assistant specialized in analyzing SEC 10-K filings.
+
+Your capabilities:
+- Extract exact financial metrics from databases
+- Search 10-K documents semantically
+- Compare companies across metrics
+- Analyze trends over time
+
+IMPORTANT - Fiscal Year Handling:
+- If user asks for "2023" data and not found, try 2024 (companies have different fiscal year ends)
+- For "latest" or "most recent", try to find the most recent year available
+- Always tell the user which fiscal year the data is actually from
+
+Guidelines for tool usage:
+- For SPECIFIC NUMBERS → Use get_financial_data tool
+- For QUALITATIVE info → Use search_10k tool  
+- For COMPARISONS → Use compare_companies tool
+
+Response guidelines:
+- **CRITICAL**: You MUST add citation numbers in square brackets [1], [2], [3] etc. immediately after EVERY fact or statement you make
+- Example: "Apple's revenue was $383 billion[1]. The iPhone is their main product[2]."
+- Place the citation marker RIGHT AFTER the fact, before the period
+- DO NOT include URLs or links in your answer
+- DO NOT use markdown citation syntax like [^1^] or [Source](url)
+- DO NOT add phrases like "This information is based on..." or "According to the 10-K filing..."
+- Simply provide a clear, direct answer with citation markers after each fact
+- State which fiscal year the data is from when relevant
+- Use precise numbers with commas
+- Be concise but complete
+- The system will automatically show full source citations below your answer
+
+REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
+
 
 class FinancialAgent:
     """
@@ -82,8 +117,8 @@ class FinancialAgent:
         
         # Create tools (pass self so tools can store sources)
         logger.info("5️⃣  Creating tools...")
-        tools_factory = ToolsFactory(self.db, self.rag_engine, agent=self)
-        self.tools = tools_factory.create_all_tools()
+        self.tools_factory = ToolsFactory(self.db, self.rag_engine, agent=self)
+        self.tools = self.tools_factory.create_all_tools()
         
         logger.info(f"   ✅ Created {len(self.tools)} tools:")
         for tool in self.tools:
@@ -100,7 +135,7 @@ class FinancialAgent:
             tools=self.tools,
             llm=self.llm,
             verbose=True,
-            system_prompt=self._get_system_prompt(),
+            system_prompt=SYSTEM_PROMPT,
             callback_manager=agent_callback_manager
         )
         
@@ -108,42 +143,6 @@ class FinancialAgent:
         logger.info("✅ FINANCIAL AGENT READY (with LangFuse callbacks)")
         logger.info("="*70 + "\n")
     
-    def _get_system_prompt(self) -> str:
-        """Get system prompt for agent"""
-        
-        return """You are a financial analysis assistant specialized in analyzing SEC 10-K filings.
-
-Your capabilities:
-- Extract exact financial metrics from databases
-- Search 10-K documents semantically
-- Compare companies across metrics
-- Analyze trends over time
-
-IMPORTANT - Fiscal Year Handling:
-- If user asks for "2023" data and not found, try 2024 (companies have different fiscal year ends)
-- For "latest" or "most recent", try to find the most recent year available
-- Always tell the user which fiscal year the data is actually from
-
-Guidelines for tool usage:
-- For SPECIFIC NUMBERS → Use get_financial_data tool
-- For QUALITATIVE info → Use search_10k tool  
-- For COMPARISONS → Use compare_companies tool
-
-Response guidelines:
-- **CRITICAL**: You MUST add citation numbers in square brackets [1], [2], [3] etc. immediately after EVERY fact or statement you make
-- Example: "Apple's revenue was $383 billion[1]. The iPhone is their main product[2]."
-- Place the citation marker RIGHT AFTER the fact, before the period
-- DO NOT include URLs or links in your answer
-- DO NOT use markdown citation syntax like [^1^] or [Source](url)
-- DO NOT add phrases like "This information is based on..." or "According to the 10-K filing..."
-- Simply provide a clear, direct answer with citation markers after each fact
-- State which fiscal year the data is from when relevant
-- Use precise numbers with commas
-- Be concise but complete
-- The system will automatically show full source citations below your answer
-
-REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
-    
     @observe(name="financial_query")
     def ask(
         self,
@@ -190,7 +189,9 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
             # Clear previous tool sources
             self.last_tool_sources = []
             
-            response = self.agent.chat(question)
+            # All tool calls for this question share one database connection
+            with self.tools_factory.connection_scope():
+                response = self.agent.chat(question)
             
             citations = []
             
@@ -199,7 +200,7 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                 logger.info("   📚 Extracting citations from source_nodes...")
                 sorted_nodes = sorted(
                     response.source_nodes,
-                    key=lambda x: getattr(x, 'score', 0),
+                    key=lambda x: getattr(x, 'score', None) or 0,
                     reverse=True
                 )
                 
@@ -217,7 +218,7 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                         "fiscal_year": metadata.get('fiscal_year', 'N/A'),
                         "filing_date": metadata.get('filing_date', 'N/A'),
                         "text": node.text,
-                        "score": float(getattr(node, 'score', 0)) if hasattr(node, 'score') else None,
+                        "score": float(node.score) if getattr(node, 'score', None) is not None else None,
                         "chunk_id": chunk_num,
                         "text_length": len(node.text),
                         "accession_number": metadata.get('accession_number', ''),
@@ -272,9 +273,7 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
             return result
         
         except Exception as e:
-            logger.error(f"\n❌ QUERY FAILED: {str(e)}\n")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception(f"\n❌ QUERY FAILED: {str(e)}\n")
             
             try:
                 langfuse_context.update_current_trace(
@@ -339,18 +338,24 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
             
             logger.info(f"✅ Downloaded {len(filings)} filing(s)\n")
             
+            # Filings indexed by an earlier run are not embedded again
+            indexed_accessions = self.rag_engine.indexed_accessions(ticker)
+            
             # Step 2: Parse and store each filing (with all years)
             parser = TenKStructuredExtractor()
             total_years_stored = 0
             
+            # Parse every filing up front (in parallel worker processes)
+            logger.info("  • Extracting structured data (all years)...")
+            parsed_filings = parser.extract_batch([filing["file_path"] for filing in filings])
+            
             for i, filing in enumerate(filings, 1):
                 logger.info(f"STEP 2.{i}: Processing filing {i}/{len(filings)}...")
                 logger.info(f"  Accession: {filing['accession']}")
                 logger.info(f"  File: {filing['file_path']}")
                 
-                # Parse structured data - extract ALL years
-                logger.info("  • Extracting structured data (all years)...")
-                all_years_data = parser.extract_all_years(filing["file_path"])
+                # Structured data - ALL years
+                all_years_data = parsed_filings[filing["file_path"]]
                 
                 if not all_years_data:
                     logger.warning(f"  ⚠️  No structured data extracted for {ticker}")
@@ -364,9 +369,7 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                     with open(filing["file_path"], 'r', encoding='utf-8', errors='ignore') as f:
                         content = f.read()
                     
-                    from bs4 import BeautifulSoup
-                    soup = BeautifulSoup(content, 'lxml')
-                    base_metadata = parser._extract_metadata(content, soup)
+                    base_metadata = parser._extract_metadata(content)
                     
                     # Create minimal structured data
                     minimal_data = Structured10K(
@@ -378,21 +381,22 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                 
                 logger.info(f"  • Found {len(all_years_data)} years of data")
                 
+                # Add company (every year of a filing shares its name and CIK,
+                # so one upsert per filing gives the id for all of them)
+                company_id = self.db.add_company(
+                    ticker=ticker,
+                    company_name=all_years_data[0].metadata.company_name,
+                    cik=all_years_data[0].metadata.cik
+                )
+                
                 # Store each year as a separate filing
                 for structured_10k in all_years_data:
                     fiscal_year = structured_10k.metadata.fiscal_year_end.year
                     
                     logger.info(f"  • Storing FY {fiscal_year} in database...")
                     
-                    # Add company
-                    company_id = self.db.add_company(
-                        ticker=ticker,
-                        company_name=structured_10k.metadata.company_name,
-                        cik=structured_10k.metadata.cik
-                    )
-                    
                     # Get structured data as dict
-                    structured_data_dict = structured_10k.key_metrics.model_dump()
+                    structured_data_dict = asdict(structured_10k.key_metrics)
 
                     # LOG WHAT WE'RE ABOUT TO INSERT
                     logger.info(f"\n    📊 STRUCTURED DATA TO INSERT FOR FY {fiscal_year}:")
@@ -433,6 +437,14 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                     
                     total_years_stored += 1
                 
+                # Tool lookups cached before this filing was stored are stale now
+                self.tools_factory.clear_cache()
+                
+                if filing["accession"] in indexed_accessions:
+                    logger.info("  ♻️  Already in RAG index, skipping text extraction")
+                    logger.info(f"  ✅ Filing {i} processed successfully\n")
+                    continue
+                
                 # Extract text for RAG
                 logger.info("  • Extracting text for RAG...")
                 text = downloader.extract_text(filing["file_path"])
@@ -441,7 +453,7 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                     # Use most recent year's metadata (or first available)
                     most_recent = all_years_data[0]
                     
-                    logger.info("  • Adding to RAG index...")
+                    # Index this filing now, so only one filing's text is held at a time
                     self.rag_engine.analyze_company(
                         ticker=ticker,
                         text=text,
@@ -450,12 +462,16 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
                             "cik": most_recent.metadata.cik,
                             "fiscal_year": most_recent.metadata.fiscal_year_end.year,
                             "filing_date": str(most_recent.metadata.filing_date),
+                            "accession_number": filing["accession"],
                             "revenue": most_recent.key_metrics.revenue,
                             "net_income": most_recent.key_metrics.net_income,
                             "total_assets": most_recent.key_metrics.total_assets
                         }
                     )
                 
+                # The filing's text is chunked and stored; release it before the next one
+                del text
+                
                 logger.info(f"  ✅ Filing {i} processed successfully\n")
             
             logger.info("="*70)
@@ -478,9 +494,7 @@ REMEMBER: Every factual statement MUST have a citation marker [1], [2], etc."""
             return True
         
         except Exception as e:
-            logger.error(f"❌ Analysis failed: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception(f"❌ Analysis failed: {str(e)}")
             
             try:
                 langfuse_context.update_current_trace(
@@ -9,8 +9,10 @@ Handles:
 """
 
 from sqlalchemy import create_engine, text, Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from functools import lru_cache
 from typing import Dict, List, Optional
 from datetime import datetime
 import os
@@ -21,9 +23,33 @@ import json
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Connection pool shared by every component talking to DATABASE_URL
+DB_POOL_SIZE = 10
+DB_POOL_RECYCLE_SECONDS = 3600
+
 Base = declarative_base()
 
 
+@lru_cache(maxsize=None)
+def get_engine(database_url: str) -> Engine:
+    """
+    Get the pooled engine for a database URL (created once per process)
+    
+    Args:
+        database_url: SQLAlchemy database URL
+    
+    Returns:
+        Engine whose connection pool is shared by all callers
+    """
+    return create_engine(
+        database_url,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+    )
+
+
 class Company(Base):
     """Companies table"""
     __tablename__ = 'companies'
@@ -69,13 +95,33 @@ class Database:
         if not self.database_url:
             raise ValueError("DATABASE_URL not found in environment variables")
         
-        self.engine = create_engine(self.database_url, echo=False, pool_pre_ping=True)
+        self.engine = get_engine(self.database_url)
         Base.metadata.create_all(self.engine)
+        self._ensure_indexes()
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
         
         logger.info("✅ Database connection established")
     
+    def _ensure_indexes(self):
+        """
+        Create the lookup indexes the agent tools rely on
+        
+        create_all() only builds missing tables, so indexes added later are
+        created here for existing databases too. companies.ticker is already
+        indexed through its unique constraint.
+        """
+        
+        with self.engine.connect() as conn:
+            # Covering index for ticker/year tool lookups: the join resolves
+            # company_id, then structured_data comes straight from the index
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_filings_lookup
+                ON filings (company_id, fiscal_year, filing_type)
+                INCLUDE (structured_data)
+            """))
+            conn.commit()
+    
     def add_company(self, ticker: str, company_name: str = None, cik: str = None, 
                    sector: str = None, industry: str = None) -> int:
         """Add or update a company"""
@@ -189,7 +235,7 @@ class Database:
             return {
                 "id": result[0], "fiscal_year": result[1], "fiscal_quarter": result[2],
                 "accession_number": result[3], "filing_type": result[4], "filing_date": result[5],
-                "file_path": result[6], "structured_data": json.loads(result[7]) if result[7] else None
+                "file_path": result[6], "structured_data": result[7]
             }
         return None
     
@@ -208,7 +254,7 @@ class Database:
         
         filings = []
         for row in result:
-            structured_data = json.loads(row[4]) if row[4] else {}
+            structured_data = row[4] or {}
             filings.append({
                 "ticker": row[0], "company": row[1], "fiscal_year": row[2], "accession": row[3],
                 "revenue": structured_data.get("revenue"), "net_income": structured_data.get("net_income"),
@@ -232,7 +278,7 @@ class Database:
         
         filings = []
         for row in result:
-            structured_data = json.loads(row[5]) if row[5] else {}
+            structured_data = row[5] or {}
             filings.append({
                 "id": row[0], "fiscal_year": row[1], "accession_number": row[2],
                 "filing_type": row[3], "filing_date": row[4],
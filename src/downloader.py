@@ -4,7 +4,8 @@ Downloads 10-K filings from SEC EDGAR database
 """
 
 from sec_edgar_downloader import Downloader
-from bs4 import BeautifulSoup
+from lxml import etree
+import lxml.html
 from pathlib import Path
 from typing import List, Dict, Optional
 import os
@@ -15,6 +16,10 @@ from dotenv import load_dotenv
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Filings are decoded up front; huge_tree allows their very large text nodes
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8', huge_tree=True)
+_TEXT_XPATH = etree.XPath('string()', smart_strings=False)
+
 
 class SECDownloader:
     """
@@ -181,15 +186,14 @@ class SECDownloader:
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
             
-            # Parse HTML/XML
-            soup = BeautifulSoup(content, 'lxml')
+            # Parse HTML/XML (as UTF-8 bytes, so XML encoding declarations are allowed)
+            tree = lxml.html.document_fromstring(content.encode('utf-8'), parser=_HTML_PARSER)
             
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+            # Remove script and style elements (their tail text is kept)
+            etree.strip_elements(tree, 'script', 'style', with_tail=False)
             
             # Get text
-            text = soup.get_text()
+            text = _TEXT_XPATH(tree)
             
             # Clean up text
             lines = (line.strip() for line in text.splitlines())
@@ -4,21 +4,368 @@ Multi-Company Stock Analyzer with RAG and LangFuse Observability
 
 from llama_index.core import VectorStoreIndex, Settings, StorageContext
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.schema import Document
-from llama_index.core.vector_stores import MetadataFilters, ExactMatchFilter
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import (
+    BaseNode, Document, MetadataMode, NodeRelationship, NodeWithScore, QueryBundle, TextNode
+)
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
 from llama_index.core.callbacks import CallbackManager
+from llama_index.core.bridge.pydantic import PrivateAttr
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 from llama_index.vector_stores.postgres import PGVectorStore
 from langfuse.decorators import observe, langfuse_context
-from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import copy
+import csv
+import io
+import multiprocessing
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import hashlib
+import numpy as np
 import os
+import random
+import re
+import threading
+import time
 from dotenv import load_dotenv
+from src.database import get_engine
 import logging
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Vector table (PGVectorStore prefixes the table name with "data_")
+VECTOR_TABLE_NAME = "chunks_all_companies"
+VECTOR_TABLE = f"data_{VECTOR_TABLE_NAME}"
+
+# Embedding model and its vector size
+EMBED_MODEL = "text-embedding-3-small"
+EMBED_DIM = 1536
+
+# Chunking used for every filing added to the index
+RAG_CHUNK_SIZE = 512
+RAG_CHUNK_OVERLAP = 50
+
+# Ingestion: chunks embedded per OpenAI round, and how many embedded
+# batches may queue up behind the database writer
+INGEST_BATCH_SIZE = 100
+MAX_PENDING_WRITES = 4
+
+# Ingestion batches embedded concurrently, and the random delay (seconds)
+# before each one so they do not all reach OpenAI at the same moment
+MAX_CONCURRENT_EMBEDDINGS = 5
+EMBED_JITTER_SECONDS = 0.1
+
+# HNSW index on the chunk embeddings (built by PGVectorStore): graph degree,
+# build-time candidate list, and the candidate list searched per query
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF_SEARCH = 100
+
+# Largest shared HNSW index pre-warmed at startup (bigger ones would only
+# evict their own pages from shared_buffers). Override with VECTOR_PREWARM_MAX_MB
+PREWARM_MAX_BYTES = int(os.getenv("VECTOR_PREWARM_MAX_MB", "256")) * 1024 * 1024
+
+# Opt-in half-precision storage (pgvector >= 0.7): the embedding column is
+# converted to halfvec, halving table and HNSW index size for near-identical
+# recall. Set VECTOR_HALFVEC=1 to enable
+HALFVEC_STORAGE = os.getenv("VECTOR_HALFVEC", "").lower() in ("1", "true", "yes")
+VECTOR_OPS = "halfvec_cosine_ops" if HALFVEC_STORAGE else "vector_cosine_ops"
+
+# Tickers that get their own partial HNSW index (literal in the DDL, so validated)
+_TICKER_RE = re.compile(r'[A-Z0-9.\-]{1,10}')
+
+# Retrieval: chunks fetched per similarity search, and how many searches
+# (one per ticker/year filter combination) may run against Postgres at once
+SIMILARITY_TOP_K = 5
+MAX_PARALLEL_QUERIES = 4
+
+# Two-stage retrieval (when sentence-transformers is installed): candidates
+# fetched per search from HNSW (kept within HNSW_EF_SEARCH), reranked by a
+# cross-encoder down to SIMILARITY_TOP_K
+RERANK_CANDIDATES = 50
+RERANK_MODEL = "BAAI/bge-reranker-base"
+
+# Query engines kept per ticker/year filter combination (LRU)
+QUERY_ENGINE_CACHE_SIZE = 32
+
+# Recent question embeddings kept in memory (repeat questions skip OpenAI)
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Answers reused for near-duplicate questions with the same filters: minimum
+# cosine similarity between question embeddings, and answers kept per filter set
+ANSWER_CACHE_SIMILARITY = 0.95
+ANSWER_CACHE_SIZE = 256
+
+# Cached answers expire after this long: the cache is only emptied by ingests
+# in this process, so filings indexed by another process reach answers late
+ANSWER_CACHE_TTL_SECONDS = 600
+
+# Literal tokens a cached answer's question must share exactly (years and
+# other numbers, upper-case ticker-like words): embeddings of "revenue in
+# 2023" and "revenue in 2022" are similar enough to pass the cosine check
+_DISCRIMINATOR_RE = re.compile(r'\b(?:\d+(?:\.\d+)?|[A-Z][A-Z0-9.\-]*[A-Z0-9]|[A-Z])\b')
+
+# Chunk metadata kept for bookkeeping only (not embedded or shown to the LLM)
+_BOOKKEEPING_METADATA_KEYS = ["chunk_idx", "accession_number"]
+
+# Splitter owned by an ingestion worker process (created on first use)
+_worker_splitter: Optional[SentenceSplitter] = None
+
+
+def _question_discriminators(question: str) -> Tuple[str, ...]:
+    """Numbers and ticker-like words in a question, sorted and de-duplicated"""
+    
+    return tuple(sorted(set(_DISCRIMINATOR_RE.findall(question))))
+
+
+def _as_fiscal_years(
+    fiscal_year: Optional[Union[int, str, List[Union[int, str]]]]
+) -> Optional[List[int]]:
+    """
+    Normalize a fiscal-year filter to a list of ints
+    
+    Tool calls often pass years as strings ("2023"); iterating one of those
+    would filter on its characters.
+    
+    Args:
+        fiscal_year: A year, a list of years, or None
+    
+    Returns:
+        List of years, or None for no year filter
+    """
+    
+    if fiscal_year is None or fiscal_year == "":
+        return None
+    
+    if isinstance(fiscal_year, (int, str)):
+        return [int(fiscal_year)]
+    
+    return [int(year) for year in fiscal_year]
+
+
+def _ticker_index_name(ticker: str) -> str:
+    """Name of a ticker's partial HNSW index (see ensure_ticker_index)"""
+    
+    return f"{VECTOR_TABLE}_hnsw_{re.sub(r'[^a-z0-9]', '_', ticker.lower())}"
+
+
+def _split_document(document: Document) -> List[BaseNode]:
+    """Split one filing into nodes inside an ingestion worker process"""
+    
+    global _worker_splitter
+    
+    if _worker_splitter is None:
+        _worker_splitter = SentenceSplitter(
+            chunk_size=RAG_CHUNK_SIZE,
+            chunk_overlap=RAG_CHUNK_OVERLAP
+        )
+    
+    return _chunk_document(document, _worker_splitter)
+
+
+def _chunk_document(document: Document, splitter: SentenceSplitter) -> List[BaseNode]:
+    """
+    Split a filing's text straight into nodes numbered by chunk_idx
+    
+    split_text() works on the plain string, skipping the node parser's
+    per-document bookkeeping (metadata-aware re-splitting, id/offset passes).
+    """
+    
+    source = document.as_related_node_info()
+    
+    return [
+        TextNode(
+            text=chunk,
+            metadata={**document.metadata, "chunk_idx": chunk_idx},
+            excluded_embed_metadata_keys=_BOOKKEEPING_METADATA_KEYS,
+            excluded_llm_metadata_keys=_BOOKKEEPING_METADATA_KEYS,
+            relationships={NodeRelationship.SOURCE: source}
+        )
+        for chunk_idx, chunk in enumerate(splitter.split_text(document.text))
+    ]
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Runs one similarity search per filter set concurrently and merges the hits
+    
+    Every sub-query checks out its own pooled connection, so Postgres walks
+    the HNSW index for each ticker/year combination in parallel (overlapping
+    their page reads) instead of one after another.
+    """
+    
+    def __init__(
+        self,
+        retrievers: List[BaseRetriever],
+        embed_model: OpenAIEmbedding,
+        executor: Executor
+    ):
+        self._retrievers = retrievers
+        self._embed_model = embed_model
+        self._executor = executor
+        super().__init__()
+    
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        # Embed the question once instead of once per sub-query
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+        
+        results = self._executor.map(
+            lambda retriever: retriever.retrieve(query_bundle),
+            self._retrievers
+        )
+        
+        # Union the candidates (keeping the best score per chunk) and rerank
+        merged: Dict[str, NodeWithScore] = {}
+        for nodes in results:
+            for node in nodes:
+                best = merged.get(node.node.node_id)
+                if best is None or (node.score or 0) > (best.score or 0):
+                    merged[node.node.node_id] = node
+        
+        return sorted(merged.values(), key=lambda node: node.score or 0, reverse=True)
+
+
+class CachedOpenAIEmbedding(OpenAIEmbedding):
+    """
+    OpenAI embeddings backed by a Postgres cache keyed on content hash
+    
+    Re-ingesting a filing produces the same chunks, so their embeddings are
+    read back from the embedding_cache table and only new text goes to the
+    API. Query embeddings are not persisted (see _question_embedding).
+    """
+    
+    _cache_engine: Any = PrivateAttr()
+    _cache_enabled: bool = PrivateAttr(default=False)
+    
+    def __init__(self, cache_engine: Engine, **kwargs):
+        super().__init__(**kwargs)
+        self._cache_engine = cache_engine
+        
+        try:
+            with cache_engine.begin() as conn:
+                # The vector type may not exist yet: PGVectorStore only creates
+                # the extension when it first touches its own table
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+                conn.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS embedding_cache (
+                        content_sha256 bytea PRIMARY KEY,
+                        embedding vector({EMBED_DIM}) NOT NULL
+                    )
+                """))
+            
+            self._cache_enabled = True
+        
+        except SQLAlchemyError as e:
+            # Skip the cache entirely rather than failing on every batch
+            logger.warning(f"   ⚠️  Embedding cache unavailable: {e.__class__.__name__}")
+    
+    def _content_hash(self, content: str) -> bytes:
+        # The model is part of the key: another model gives other vectors
+        return hashlib.sha256(f"{self.model_name}\0{content}".encode("utf-8")).digest()
+    
+    def get_text_embedding_batch(self, texts: List[str], show_progress: bool = False, **kwargs) -> List[List[float]]:
+        if not texts:
+            return []
+        
+        if not self._cache_enabled:
+            return super().get_text_embedding_batch(texts, show_progress=show_progress, **kwargs)
+        
+        hashes = [self._content_hash(content) for content in texts]
+        
+        try:
+            with self._cache_engine.connect() as conn:
+                rows = conn.execute(
+                    text("SELECT content_sha256, CAST(embedding AS text) FROM embedding_cache "
+                         "WHERE content_sha256 = ANY(:hashes)"),
+                    {"hashes": hashes}
+                ).fetchall()
+            # pgvector's text form ("[0.1,0.2,...]") is a JSON array
+            cached = {bytes(digest): json.loads(vector) for digest, vector in rows}
+        
+        except SQLAlchemyError as e:
+            logger.warning(f"   ⚠️  Embedding cache lookup failed: {e.__class__.__name__}")
+            cached = {}
+        
+        misses = [i for i, digest in enumerate(hashes) if digest not in cached]
+        
+        if misses:
+            new_embeddings = super().get_text_embedding_batch(
+                [texts[i] for i in misses], show_progress=show_progress, **kwargs
+            )
+            
+            for i, embedding in zip(misses, new_embeddings):
+                cached[hashes[i]] = embedding
+            
+            try:
+                with self._cache_engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO embedding_cache (content_sha256, embedding) "
+                             "VALUES (:digest, CAST(:embedding AS vector)) ON CONFLICT DO NOTHING"),
+                        [
+                            {"digest": hashes[i], "embedding": "[" + ",".join(map(str, embedding)) + "]"}
+                            for i, embedding in zip(misses, new_embeddings)
+                        ]
+                    )
+            
+            except SQLAlchemyError as e:
+                logger.warning(f"   ⚠️  Embedding cache write failed: {e.__class__.__name__}")
+        
+        return [cached[digest] for digest in hashes]
+
+
+class BatchPGVectorStore(PGVectorStore):
+    """
+    PGVectorStore that loads nodes with one COPY per batch
+    
+    The stock add() flushes an ORM object per node; COPY streams the whole
+    batch (text, metadata and pgvector literals as CSV) in a single command.
+    """
+    
+    def add(self, nodes: List[BaseNode], **add_kwargs) -> List[str]:
+        # The hybrid-search variant has an extra tsvector column; leave it to the ORM path
+        if self.hybrid_search or not nodes:
+            return super().add(nodes, **add_kwargs)
+        
+        self._initialize()
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for node in nodes:
+            writer.writerow((
+                node.node_id,
+                node.get_content(metadata_mode=MetadataMode.NONE),
+                json.dumps(node_to_metadata_dict(node, remove_text=True, flat_metadata=self.flat_metadata)),
+                "[" + ",".join(map(str, node.get_embedding())) + "]",
+            ))
+        buffer.seek(0)
+        
+        table = f'"{self.schema_name}"."{self._table_class.__tablename__}"'
+        connection = self._engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table} (node_id, text, metadata_, embedding) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            connection.commit()
+        finally:
+            connection.close()
+        
+        return [node.node_id for node in nodes]
+
 
 class MultiCompanyStockAnalyzer:
     """
@@ -44,16 +391,26 @@ class MultiCompanyStockAnalyzer:
         from urllib.parse import urlparse
         parsed = urlparse(database_url)
         
-        self.vector_store = PGVectorStore.from_params(
+        self.vector_store = BatchPGVectorStore.from_params(
             database=parsed.path[1:],
             host=parsed.hostname,
             password=parsed.password,
             port=parsed.port or 5432,
             user=parsed.username,
-            table_name="chunks_all_companies",
-            embed_dim=1536,
+            table_name=VECTOR_TABLE_NAME,
+            embed_dim=EMBED_DIM,
+            hnsw_kwargs={
+                "hnsw_m": HNSW_M,
+                "hnsw_ef_construction": HNSW_EF_CONSTRUCTION,
+                "hnsw_ef_search": HNSW_EF_SEARCH,
+                "hnsw_dist_method": "vector_cosine_ops",
+            },
         )
         
+        # Plain SQL access to the vector table (maintenance, cache warm-up),
+        # through the same connection pool as Database
+        self._sql_engine = get_engine(database_url)
+        
         logger.info("   ✅ Vector store connected")
         
         # 2. OpenAI setup
@@ -63,8 +420,9 @@ class MultiCompanyStockAnalyzer:
         if not openai_api_key:
             raise ValueError("OPENAI_API_KEY not found in environment")
         
-        self.embed_model = OpenAIEmbedding(
-            model="text-embedding-3-small",
+        self.embed_model = CachedOpenAIEmbedding(
+            cache_engine=self._sql_engine,
+            model=EMBED_MODEL,
             api_key=openai_api_key,
             embed_batch_size=10  # Reduce batch size to avoid rate limits
         )
@@ -108,12 +466,66 @@ class MultiCompanyStockAnalyzer:
             logger.warning(f"   ⚠️  LangFuse setup failed: {str(e)}")
             logger.info("   ℹ️  Continuing without observability...")
         
+        # Cross-encoder reranker (optional)
+        self.reranker = None
+        
+        try:
+            from llama_index.core.postprocessor import SentenceTransformerRerank
+            
+            self.reranker = SentenceTransformerRerank(
+                model=RERANK_MODEL,
+                top_n=SIMILARITY_TOP_K
+            )
+            logger.info(f"   ✅ Reranker enabled: {RERANK_MODEL} ({RERANK_CANDIDATES} → {SIMILARITY_TOP_K} per search)")
+        
+        except ImportError:
+            logger.info("   ℹ️  Reranker disabled (install sentence-transformers to enable)")
+        
+        except Exception as e:
+            # e.g. the model could not be downloaded or loaded
+            logger.warning(f"   ⚠️  Reranker setup failed: {str(e)}")
+            logger.info("   ℹ️  Continuing without reranking...")
+        
         # 4. Configure LlamaIndex Settings
         logger.info("\n4️⃣  Configuring LlamaIndex settings...")
         Settings.embed_model = self.embed_model
         Settings.llm = self.llm
-        Settings.chunk_size = 512
-        Settings.chunk_overlap = 50
+        Settings.chunk_size = RAG_CHUNK_SIZE
+        Settings.chunk_overlap = RAG_CHUNK_OVERLAP
+        
+        # Reuse one splitter (and its tokenizer) for every filing
+        self._splitter = SentenceSplitter(
+            chunk_size=RAG_CHUNK_SIZE,
+            chunk_overlap=RAG_CHUNK_OVERLAP
+        )
+        
+        # Threads for concurrent similarity searches (see FanOutRetriever)
+        self._query_pool = ThreadPoolExecutor(
+            max_workers=MAX_PARALLEL_QUERIES,
+            thread_name_prefix="rag-query"
+        )
+        
+        # LRU of query engines, keyed by (tickers, fiscal years, temperature,
+        # streaming); they only wrap the index, so newly indexed chunks never
+        # invalidate them
+        self._query_engines: OrderedDict = OrderedDict()
+        self._query_engines_lock = threading.Lock()
+        
+        # Cleared once pg_prewarm fails, so later ingests do not retry it
+        self._prewarm_available = True
+        
+        # LRU of question embeddings, keyed by (model, whitespace-collapsed
+        # question); each holds the embedding of the first question seen as typed
+        self._query_embeddings: OrderedDict = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+        
+        # Semantic answer cache: (tickers, years, temperature, max_tokens,
+        # question discriminators) ->
+        # (unit question embeddings stacked as rows, (stored_at, answer) in the
+        # same order). Emptied whenever this process indexes new chunks;
+        # entries also expire after ANSWER_CACHE_TTL_SECONDS
+        self._answer_cache: Dict[tuple, Tuple[np.ndarray, List[Tuple[float, Dict]]]] = {}
+        self._answer_cache_lock = threading.Lock()
         
         if self.langfuse_handler:
             Settings.callback_manager = CallbackManager([self.langfuse_handler])
@@ -124,6 +536,8 @@ class MultiCompanyStockAnalyzer:
         # 5. Load or create index
         logger.info("\n5️⃣  Loading vector index...")
         self.index = self.load_index()
+        self.ensure_vector_indexes()
+        self.prewarm_vector_table()
         logger.info("   ✅ Index ready")
         
         logger.info("\n" + "="*70)
@@ -146,8 +560,8 @@ class MultiCompanyStockAnalyzer:
             logger.info("   ✅ Loaded existing index")
             return index
         
-        except Exception as e:
-            logger.info(f"   ℹ️  Creating new index")
+        except (SQLAlchemyError, ValueError):
+            logger.exception("   ⚠️  Could not load existing index, creating new one")
             
             storage_context = StorageContext.from_defaults(
                 vector_store=self.vector_store
@@ -160,6 +574,224 @@ class MultiCompanyStockAnalyzer:
             
             return index
     
+    def indexed_accessions(self, ticker: str) -> set:
+        """
+        Accession numbers of a ticker's filings already in the vector table
+        
+        Args:
+            ticker: Stock ticker symbol
+        
+        Returns:
+            Set of accession numbers (empty if the table does not exist yet)
+        """
+        
+        try:
+            with self._sql_engine.connect() as conn:
+                accessions = conn.execute(
+                    text(
+                        f"SELECT DISTINCT metadata_->>'accession_number' FROM {VECTOR_TABLE} "
+                        f"WHERE metadata_->>'ticker' = :ticker"
+                    ),
+                    {"ticker": ticker}
+                ).scalars().all()
+        
+        except SQLAlchemyError as e:
+            logger.info(f"   ℹ️  Skipping indexed-filing lookup: {e.__class__.__name__}")
+            return set()
+        
+        return {accession for accession in accessions if accession}
+    
+    def ensure_vector_indexes(self) -> None:
+        """
+        Index the ticker metadata key that every filtered search uses
+        
+        PGVectorStore creates the table and its HNSW index on first use; this
+        adds a btree on metadata_->>'ticker' so ticker filters are not
+        evaluated row by row. Skipped (and retried after the next ingest) while
+        the table does not exist yet.
+        
+        For a large backfill it is faster to drop the HNSW index, load, and
+        let it be rebuilt than to maintain it row by row.
+        """
+        
+        if HALFVEC_STORAGE:
+            self.ensure_halfvec_storage()
+        
+        try:
+            with self._sql_engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {VECTOR_TABLE}_ticker_idx "
+                    f"ON {VECTOR_TABLE} ((metadata_->>'ticker'))"
+                ))
+        
+        except SQLAlchemyError as e:
+            logger.info(f"   ℹ️  Skipping ticker index: {e.__class__.__name__}")
+    
+    def ensure_halfvec_storage(self) -> None:
+        """
+        Convert the embedding column to halfvec (see HALFVEC_STORAGE)
+        
+        PGVectorStore always creates a vector column; once it exists, its HNSW
+        indexes (shared and per-ticker) are dropped, the column is cast to
+        halfvec, and the same indexes are rebuilt with halfvec_cosine_ops, all
+        in one transaction. Queries need no change: Postgres casts the query
+        vector to the column type. No-op once converted.
+        """
+        
+        try:
+            with self._sql_engine.begin() as conn:
+                column_type = conn.execute(
+                    text(
+                        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                        "WHERE attrelid = CAST(:table AS regclass) AND attname = 'embedding'"
+                    ),
+                    {"table": VECTOR_TABLE}
+                ).scalar()
+                
+                if column_type is None or column_type.startswith("halfvec"):
+                    return
+                
+                hnsw_indexes = conn.execute(
+                    text(
+                        "SELECT indexname, indexdef FROM pg_indexes "
+                        "WHERE tablename = :table AND indexdef LIKE '%USING hnsw%'"
+                    ),
+                    {"table": VECTOR_TABLE}
+                ).all()
+                
+                for index_name, _ in hnsw_indexes:
+                    conn.execute(text(f"DROP INDEX {index_name}"))
+                
+                conn.execute(text(
+                    f"ALTER TABLE {VECTOR_TABLE} ALTER COLUMN embedding "
+                    f"TYPE halfvec({EMBED_DIM}) USING embedding::halfvec({EMBED_DIM})"
+                ))
+                
+                for _, index_def in hnsw_indexes:
+                    conn.execute(text(index_def.replace("vector_cosine_ops", "halfvec_cosine_ops")))
+            
+            logger.info(f"   ✅ Converted {VECTOR_TABLE} embeddings to halfvec ({len(hnsw_indexes)} HNSW index(es) rebuilt)")
+        
+        except SQLAlchemyError as e:
+            logger.info(f"   ℹ️  Skipping halfvec conversion: {e.__class__.__name__}")
+    
+    def ensure_ticker_index(self, ticker: str) -> None:
+        """
+        Give one ticker its own partial HNSW index
+        
+        A ticker-filtered search on the shared HNSW index walks the whole
+        graph and drops other companies' chunks afterwards (and can come back
+        short of SIMILARITY_TOP_K). Postgres picks a partial index whose
+        predicate matches the filter PGVectorStore emits, so the search only
+        walks that ticker's chunks.
+        
+        Args:
+            ticker: Stock ticker whose chunks were just indexed
+        """
+        
+        if not _TICKER_RE.fullmatch(ticker):
+            logger.warning(f"   ⚠️  Not indexing unexpected ticker {ticker!r}")
+            return
+        
+        index_name = _ticker_index_name(ticker)
+        
+        try:
+            with self._sql_engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {VECTOR_TABLE} "
+                    f"USING hnsw (embedding {VECTOR_OPS}) "
+                    f"WITH (m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}) "
+                    f"WHERE (metadata_->>'ticker') = '{ticker}'"
+                ))
+            
+            logger.info(f"   ✅ HNSW index ready for {ticker}")
+        
+        except SQLAlchemyError as e:
+            logger.info(f"   ℹ️  Skipping {ticker} HNSW index: {e.__class__.__name__}")
+            return
+        
+        # Warm it now, while ingesting, rather than on the ticker's first question
+        self.prewarm_ticker(ticker)
+    
+    def prewarm_vector_table(self) -> None:
+        """
+        Load the shared HNSW index into Postgres shared_buffers
+        
+        Without this the first unfiltered queries after a restart walk the
+        HNSW graph from disk. Only the index those searches use is warmed (no
+        heap, btree or per-ticker indexes; see prewarm_ticker), and only if it
+        fits in PREWARM_MAX_BYTES. Skipped if the pg_prewarm extension is not
+        available.
+        """
+        
+        try:
+            with self._sql_engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_prewarm"))
+                
+                indexes = conn.execute(
+                    text(
+                        "SELECT indexname, pg_relation_size(CAST(indexname AS regclass)) "
+                        "FROM pg_indexes WHERE tablename = :table "
+                        "AND indexdef LIKE '%USING hnsw%' AND indexdef NOT LIKE '% WHERE %'"
+                    ),
+                    {"table": VECTOR_TABLE}
+                ).all()
+                
+                for index_name, size in indexes:
+                    if size > PREWARM_MAX_BYTES:
+                        logger.info(f"   ℹ️  Not pre-warming {index_name} ({size // 2**20:,} MB over budget)")
+                        continue
+                    
+                    pages = conn.execute(
+                        text("SELECT pg_prewarm(CAST(:relation AS regclass))"),
+                        {"relation": index_name}
+                    ).scalar()
+                    logger.info(f"   ✅ Pre-warmed {index_name} ({pages:,} pages)")
+        
+        except SQLAlchemyError as e:
+            self._prewarm_available = False
+            logger.info(f"   ℹ️  Skipping cache pre-warm: {e.__class__.__name__}")
+    
+    def prewarm_ticker(self, ticker: str) -> None:
+        """
+        Load one ticker's partial HNSW index into shared_buffers
+        
+        Called right after the index is built or extended at ingest time (see
+        ensure_ticker_index), never on the query path. Indexes larger than
+        PREWARM_MAX_BYTES are left alone, and after the first failure (e.g.
+        pg_prewarm not installed) pre-warming is skipped for this process.
+        
+        Args:
+            ticker: Stock ticker whose index was just built
+        """
+        
+        if not self._prewarm_available or not _TICKER_RE.fullmatch(ticker):
+            return
+        
+        index_name = _ticker_index_name(ticker)
+        
+        try:
+            with self._sql_engine.begin() as conn:
+                size = conn.execute(
+                    text("SELECT pg_relation_size(CAST(:relation AS regclass))"),
+                    {"relation": index_name}
+                ).scalar()
+                
+                if size > PREWARM_MAX_BYTES:
+                    logger.info(f"   ℹ️  Not pre-warming {ticker} HNSW index ({size // 2**20:,} MB over budget)")
+                    return
+                
+                pages = conn.execute(
+                    text("SELECT pg_prewarm(CAST(:relation AS regclass))"),
+                    {"relation": index_name}
+                ).scalar()
+            
+            logger.info(f"   ✅ Pre-warmed {ticker} HNSW index ({pages:,} pages)")
+        
+        except SQLAlchemyError as e:
+            self._prewarm_available = False
+            logger.info(f"   ℹ️  Skipping {ticker} pre-warm (disabled from now on): {e.__class__.__name__}")
+    
     @observe(name="rag_index_company")
     def analyze_company(
         self,
@@ -186,58 +818,245 @@ class MultiCompanyStockAnalyzer:
         
         logger.info(f"\n📊 Adding {ticker} to RAG index...")
         
-        # Ensure ticker is in metadata
-        metadata["ticker"] = ticker
+        document = self._build_document(ticker, text, metadata)
+        nodes = self._split_documents([document])
         
-        # Convert all metadata values to strings (required for filtering)
-        for key, value in metadata.items():
-            if value is not None:
-                metadata[key] = str(value)
+        logger.info(f"   • Created {len(nodes)} text chunks")
+        logger.info(f"   • Metadata: {list(metadata.keys())}")
+        
+        # Embed and store (embeddings tracked by LangFuse automatically)
+        self._insert_nodes(nodes)
+        self.ensure_ticker_index(ticker)
+        
+        logger.info(f"   ✅ {ticker} added to RAG index ({len(nodes)} chunks)\n")
         
-        # Parse text into chunks
-        parser = SentenceSplitter(
-            chunk_size=512,
-            chunk_overlap=50
+        langfuse_context.update_current_observation(
+            output={"num_chunks": len(nodes)},
+            metadata={"success": True}
         )
+    
+    @observe(name="rag_index_filings")
+    def analyze_filings(self, filings: List[Dict]) -> None:
+        """
+        Add several filings to the RAG index in one batch
         
-        document = Document(
-            text=text,
-            metadata=metadata
+        Chunking is CPU-bound (tokenizer), so the filings are split in
+        parallel worker processes before their nodes are inserted.
+        
+        Args:
+            filings: List of dicts with "ticker", "text" and "metadata" keys
+        """
+        
+        if not filings:
+            return
+        
+        langfuse_context.update_current_observation(
+            metadata={
+                "tickers": sorted({filing["ticker"] for filing in filings}),
+                "num_filings": len(filings),
+                "text_length": sum(len(filing["text"]) for filing in filings)
+            }
         )
         
-        nodes = parser.get_nodes_from_documents([document])
+        logger.info(f"\n📊 Adding {len(filings)} filing(s) to RAG index...")
         
-        logger.info(f"   • Created {len(nodes)} text chunks")
-        logger.info(f"   • Metadata: {list(metadata.keys())}")
+        documents = [
+            self._build_document(filing["ticker"], filing["text"], filing["metadata"])
+            for filing in filings
+        ]
+        nodes = self._split_documents(documents)
+        num_chunks = len(nodes)
         
-        # Insert into index (embeddings tracked by LangFuse automatically)
-        self.index.insert_nodes(nodes)
+        logger.info(f"   • Created {num_chunks} text chunks")
         
-        logger.info(f"   ✅ {ticker} added to RAG index ({len(nodes)} chunks)\n")
+        self._insert_nodes(nodes)
+        
+        # Chunks (with their embeddings) are persisted; free them before the
+        # ticker indexes are built
+        del nodes
+        
+        for ticker in sorted({filing["ticker"] for filing in filings}):
+            self.ensure_ticker_index(ticker)
+        
+        logger.info(f"   ✅ {len(filings)} filing(s) added to RAG index ({num_chunks} chunks)\n")
         
         langfuse_context.update_current_observation(
-            output={"num_chunks": len(nodes)},
+            output={"num_chunks": num_chunks},
             metadata={"success": True}
         )
     
+    def _build_document(self, ticker: str, text: str, metadata: Dict) -> Document:
+        """Wrap filing text in a Document with filterable metadata"""
+        
+        # Ensure ticker is in metadata. Other values keep their types so
+        # numeric fields stay numbers in the JSON metadata (and can be
+        # range-filtered, e.g. fiscal_year >= 2022)
+        metadata["ticker"] = ticker
+        
+        return Document(
+            text=text,
+            metadata=metadata
+        )
+    
+    def _insert_nodes(self, nodes: List[BaseNode]) -> None:
+        """
+        Embed nodes in batches and write them straight to the vector store
+        
+        Up to MAX_CONCURRENT_EMBEDDINGS batches are embedded at once (the
+        OpenAI calls are network-bound), and embedding is pipelined with
+        inserting: finished batches are written in order on the writer thread
+        while later ones are still being embedded. At most MAX_PENDING_WRITES
+        embedded batches wait on the writer.
+        """
+        
+        embedding = deque()
+        pending = deque()
+        
+        def write(batch: List[BaseNode]) -> None:
+            # Back-pressure: wait for the oldest write before queueing more
+            if len(pending) >= MAX_PENDING_WRITES:
+                pending.popleft().result()
+            
+            pending.append(writer.submit(self.vector_store.add, batch))
+        
+        with ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_EMBEDDINGS, thread_name_prefix="rag-embed"
+        ) as embedder, ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-writer") as writer:
+            for start in range(0, len(nodes), INGEST_BATCH_SIZE):
+                embedding.append(
+                    embedder.submit(self._embed_batch, nodes[start:start + INGEST_BATCH_SIZE])
+                )
+                
+                # Keep MAX_CONCURRENT_EMBEDDINGS requests in flight, writing in order
+                if len(embedding) >= MAX_CONCURRENT_EMBEDDINGS:
+                    write(embedding.popleft().result())
+            
+            while embedding:
+                write(embedding.popleft().result())
+            
+            # Surface any write error
+            for future in pending:
+                future.result()
+        
+        # The table exists once the first batch is in
+        self.ensure_vector_indexes()
+        
+        # Cached answers may miss the new chunks
+        self.clear_answer_cache()
+    
+    def _embed_batch(self, batch: List[BaseNode]) -> List[BaseNode]:
+        """Embed one batch of nodes in place (runs on an embedding thread)"""
+        
+        # Jitter so concurrent batches don't hit the API in lock-step (fewer 429s)
+        time.sleep(random.uniform(0, EMBED_JITTER_SECONDS))
+        
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        embeddings = self.embed_model.get_text_embedding_batch(texts, show_progress=False)
+        
+        for node, embedding in zip(batch, embeddings):
+            node.embedding = embedding
+        
+        return batch
+    
+    def clear_answer_cache(self) -> None:
+        """Forget all cached answers (see _cached_answer)"""
+        
+        with self._answer_cache_lock:
+            self._answer_cache.clear()
+    
+    def _cached_answer(self, key: tuple, embedding: np.ndarray) -> Optional[Dict]:
+        """
+        Answer to an earlier question similar enough to this one
+        
+        Args:
+            key: Filter/generation settings the answer must share
+            embedding: Unit-normalized question embedding
+        
+        Returns:
+            A private copy of the cached result dict, or None
+        """
+        
+        with self._answer_cache_lock:
+            entry = self._answer_cache.get(key)
+            if entry is None:
+                return None
+            
+            # Rows are unit vectors, so one matrix-vector product gives every cosine
+            vectors, answers = entry
+            similarities = vectors @ embedding
+            
+            # Expired answers never match
+            oldest = time.monotonic() - ANSWER_CACHE_TTL_SECONDS
+            expired = np.fromiter((stored_at < oldest for stored_at, _ in answers), dtype=bool)
+            similarities[expired] = -1.0
+            best = int(similarities.argmax())
+            
+            if similarities[best] < ANSWER_CACHE_SIMILARITY:
+                return None
+            
+            # Callers may modify the result (e.g. its sources), so never share it
+            return copy.deepcopy(answers[best][1])
+    
+    def _cache_answer(self, key: tuple, embedding: np.ndarray, result: Dict) -> None:
+        """Remember (a copy of) an answer, dropping the oldest one past ANSWER_CACHE_SIZE"""
+        
+        entry = (time.monotonic(), copy.deepcopy(result))
+        
+        with self._answer_cache_lock:
+            empty = (np.empty((0, embedding.shape[0]), dtype=np.float32), [])
+            vectors, answers = self._answer_cache.get(key, empty)
+            vectors = np.vstack([vectors, embedding])[-ANSWER_CACHE_SIZE:]
+            answers = (answers + [entry])[-ANSWER_CACHE_SIZE:]
+            self._answer_cache[key] = (vectors, answers)
+    
+    def _split_documents(self, documents: List[Document]) -> List[BaseNode]:
+        """
+        Split documents into nodes
+        
+        A single document is split in-process with the shared splitter.
+        Several documents are fanned out to worker processes, one per
+        document, which side-steps the GIL for the tokenizer.
+        """
+        
+        if len(documents) == 1:
+            return _chunk_document(documents[0], self._splitter)
+        
+        max_workers = min(len(documents), os.cpu_count() or 1)
+        
+        # Spawned (not forked) workers: this process has live threads, pooled
+        # connections and locks that a fork would copy mid-use
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            node_lists = list(pool.map(_split_document, documents))
+        
+        return [node for nodes in node_lists for node in nodes]
+    
     @observe(name="rag_vector_search")
     def ask(
         self,
         question: str,
-        ticker: Optional[str] = None,
-        fiscal_year: Optional[int] = None,
+        ticker: Optional[Union[str, List[str]]] = None,
+        fiscal_year: Optional[Union[int, str, List[int]]] = None,
         temperature: float = 0.1,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        stream_callback: Optional[Callable[[str], None]] = None
     ) -> Dict:
         """
         Ask a question with vector search - automatically tracked by LangFuse
         
+        Passing several tickers and/or fiscal years runs one similarity
+        search per combination concurrently and merges the results.
+        
         Args:
             question: User question
-            ticker: Filter by ticker (optional)
-            fiscal_year: Filter by year (optional)
+            ticker: Filter by ticker, or a list of tickers (optional)
+            fiscal_year: Filter by year, or a list of years (optional)
             temperature: LLM temperature
             max_tokens: Max response tokens
+            stream_callback: Called with each answer token as the LLM
+                produces it (optional; the full answer is still returned)
         
         Returns:
             Dictionary with answer, sources, and metadata
@@ -253,78 +1072,109 @@ class MultiCompanyStockAnalyzer:
             }
         )
         
-        logger.info(f"\n🔍 RAG Query: '{question[:50]}...'")
-        logger.info(f"   Filters: ticker={ticker}, year={fiscal_year}")
+        logger.info("\n🔍 RAG Query: '%s...'", question[:50])
+        logger.info("   Filters: ticker=%s, year=%s", ticker, fiscal_year)
+        
+        tickers = [ticker] if isinstance(ticker, str) else ticker
+        fiscal_years = _as_fiscal_years(fiscal_year)
         
-        # Build metadata filters
-        metadata_filters = None
         filters_applied = {}
         
-        if ticker or fiscal_year:
-            filter_list = []
-            
-            if ticker:
-                filter_list.append(ExactMatchFilter(key="ticker", value=ticker))
-                filters_applied["ticker"] = ticker
-            
-            if fiscal_year:
-                # Convert to string for filtering
-                filter_list.append(ExactMatchFilter(key="fiscal_year", value=str(fiscal_year)))
-                filters_applied["fiscal_year"] = fiscal_year
-            
-            metadata_filters = MetadataFilters(filters=filter_list)
-            logger.info(f"   ✅ Applied filters: {filters_applied}")
+        if ticker:
+            filters_applied["ticker"] = ticker
+        if fiscal_year:
+            filters_applied["fiscal_year"] = fiscal_year
+        
+        if filters_applied:
+            num_searches = len(tickers or [None]) * len(fiscal_years or [None])
+            logger.info("   ✅ Applied filters: %s (%d search(es))", filters_applied, num_searches)
         else:
             logger.info("   ℹ️  No filters applied (searching all documents)")
         
         try:
-            # Update LLM temperature
-            self.llm.temperature = temperature
-            
-            # Create query engine with filters
-            query_engine = self.index.as_query_engine(
-                similarity_top_k=5,
-                filters=metadata_filters,
-                response_mode="tree_summarize",
-                verbose=True
+            # Embed once (or reuse a cached embedding) so retrieval skips it
+            question_embedding = self._question_embedding(question)
+            
+            # A near-duplicate question with the same filters (and the same
+            # years/tickers in its text) reuses its answer
+            cache_key = (
+                tuple(tickers or ()), tuple(fiscal_years or ()), temperature, max_tokens,
+                _question_discriminators(question)
+            )
+            unit_embedding = np.asarray(question_embedding, dtype=np.float32)
+            unit_embedding /= np.linalg.norm(unit_embedding) or 1.0
+            
+            cached = self._cached_answer(cache_key, unit_embedding)
+            if cached is not None:
+                logger.info("   ♻️  Reusing the answer to a similar question (%d sources)", cached["num_sources"])
+                langfuse_context.update_current_observation(
+                    output={"num_sources": cached["num_sources"]},
+                    metadata={"success": True, "answer_cache_hit": True}
+                )
+                if stream_callback:
+                    stream_callback(cached["answer"])
+                return cached
+            
+            # Query engine for these filters (built once per combination)
+            query_engine = self._query_engine(
+                tickers, fiscal_years, temperature, streaming=stream_callback is not None
+            )
+            
+            query_bundle = QueryBundle(
+                query_str=question,
+                embedding=question_embedding
             )
             
             # Execute query (embeddings and LLM calls tracked automatically)
             logger.info("   🤔 Executing query...")
-            response = query_engine.query(question)
-            
-            # Extract sources
-            sources = []
-            if hasattr(response, 'source_nodes'):
-                for i, node in enumerate(response.source_nodes):
-                    metadata = node.metadata if hasattr(node, 'metadata') else {}
-                    node_id = getattr(node, 'node_id', 'unknown')
-                    chunk_num = node_id.split('-')[-1] if '-' in str(node_id) else 'N/A'
-                    
-                    sources.append({
-                        "index": i + 1,
-                        "text": node.text,  # Full text, not truncated
-                        "score": float(node.score) if hasattr(node, 'score') else None,
-                        "metadata": metadata,
-                        "company_name": metadata.get('company_name', 'Unknown'),
-                        "ticker": metadata.get('ticker', 'N/A'),
-                        "fiscal_year": metadata.get('fiscal_year', 'N/A'),
-                        "filing_date": metadata.get('filing_date', 'N/A'),
-                        "accession_number": metadata.get('accession_number', ''),
-                        "filing_url": metadata.get('filing_url', ''),
-                        "chunk_id": chunk_num
-                    })
-                
-                logger.info(f"   ✅ Found {len(sources)} relevant sources")
+            response = query_engine.query(query_bundle)
+            
+            if stream_callback:
+                # Hand tokens over as they arrive instead of after the whole completion
+                tokens = []
+                for token in response.response_gen:
+                    tokens.append(token)
+                    stream_callback(token)
+                answer = "".join(tokens)
+            else:
+                answer = str(response)
+            
+            # Extract sources (a reranker leaves numpy float32 scores, which
+            # JSON cannot encode, so they are converted here once)
+            source_nodes = response.source_nodes
+            metadatas = [node.metadata for node in source_nodes]
+            
+            sources = [
+                {
+                    "index": i,
+                    "text": node.text,  # Full text, not truncated
+                    "score": float(node.score) if node.score is not None else None,
+                    "company_name": metadata.get('company_name', 'Unknown'),
+                    "ticker": metadata.get('ticker', 'N/A'),
+                    "fiscal_year": metadata.get('fiscal_year', 'N/A'),
+                    "filing_date": metadata.get('filing_date', 'N/A'),
+                    "accession_number": metadata.get('accession_number', ''),
+                    "filing_url": metadata.get('filing_url', ''),
+                    "chunk_id": metadata.get(
+                        'chunk_idx',
+                        node.node_id.rsplit('-', 1)[-1] if '-' in node.node_id else 'N/A'
+                    )
+                }
+                for i, (node, metadata) in enumerate(zip(source_nodes, metadatas), 1)
+            ]
+            
+            logger.info("   ✅ Found %d relevant sources", len(sources))
             
             result = {
-                "answer": str(response),
+                "answer": answer,
                 "sources": sources,
                 "filters_applied": filters_applied,
                 "num_sources": len(sources)
             }
             
-            logger.info(f"   ✅ Query complete\n")
+            logger.info("   ✅ Query complete\n")
+            
+            self._cache_answer(cache_key, unit_embedding, result)
             
             # Update observation with results
             langfuse_context.update_current_observation(
@@ -335,9 +1185,7 @@ class MultiCompanyStockAnalyzer:
             return result
         
         except Exception as e:
-            logger.error(f"   ❌ RAG query failed: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception("   ❌ RAG query failed: %s", e)
             
             # Mark as error in LangFuse
             langfuse_context.update_current_observation(
@@ -350,4 +1198,184 @@ class MultiCompanyStockAnalyzer:
                 "sources": [],
                 "filters_applied": filters_applied,
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+    
+    async def aask(
+        self,
+        question: str,
+        ticker: Optional[Union[str, List[str]]] = None,
+        fiscal_year: Optional[Union[int, str, List[int]]] = None,
+        temperature: float = 0.1,
+        max_tokens: Optional[int] = None
+    ) -> Dict:
+        """
+        Async ask(): runs it in a worker thread so several questions can be
+        awaited together (e.g. with asyncio.gather)
+        
+        Args:
+            question: User question
+            ticker: Filter by ticker, or a list of tickers (optional)
+            fiscal_year: Filter by year, or a list of years (optional)
+            temperature: LLM temperature
+            max_tokens: Max response tokens
+        
+        Returns:
+            Dictionary with answer, sources, and metadata
+        """
+        
+        return await asyncio.to_thread(
+            self.ask, question, ticker, fiscal_year, temperature, max_tokens
+        )
+    
+    def _question_embedding(self, question: str) -> List[float]:
+        """Embedding for a question, shared by repeat/near-duplicate questions"""
+        
+        # The key only collapses whitespace: embeddings are case-sensitive
+        # ("US" vs "us"), so questions differing in case stay distinct
+        key = (self.embed_model.model_name, " ".join(question.split()))
+        
+        with self._query_embeddings_lock:
+            embedding = self._query_embeddings.get(key)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(key)
+                return embedding
+        
+        embedding = self.embed_model.get_query_embedding(question)
+        
+        with self._query_embeddings_lock:
+            self._query_embeddings.setdefault(key, embedding)
+            self._query_embeddings.move_to_end(key)
+            if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        
+        return embedding
+    
+    def _query_engine(
+        self,
+        tickers: Optional[List[str]],
+        fiscal_years: Optional[List[int]],
+        temperature: float,
+        streaming: bool = False
+    ) -> RetrieverQueryEngine:
+        """
+        Query engine filtered to the given tickers/years, reused across questions
+        
+        Each engine has its own copy of the LLM at the requested temperature,
+        so concurrent questions (see aask) never change each other's settings.
+        
+        Args:
+            tickers: Tickers to search (None for all)
+            fiscal_years: Fiscal years to search (None for all)
+            temperature: LLM temperature
+            streaming: Whether responses stream their tokens
+        
+        Returns:
+            Cached or newly built query engine
+        """
+        
+        key = (tuple(tickers or ()), tuple(fiscal_years or ()), temperature, streaming)
+        
+        with self._query_engines_lock:
+            query_engine = self._query_engines.get(key)
+            if query_engine is not None:
+                self._query_engines.move_to_end(key)
+                return query_engine
+        
+        # Build metadata filters (one set per ticker/year combination)
+        filter_sets = self._build_filter_sets(tickers, fiscal_years)
+        query_engine = RetrieverQueryEngine.from_args(
+            self._build_retriever(filter_sets),
+            llm=self.llm.copy(update={"temperature": temperature}),
+            node_postprocessors=self._build_postprocessors(filter_sets),
+            response_mode="tree_summarize",
+            streaming=streaming,
+            verbose=False
+        )
+        
+        with self._query_engines_lock:
+            self._query_engines[key] = query_engine
+            self._query_engines.move_to_end(key)
+            if len(self._query_engines) > QUERY_ENGINE_CACHE_SIZE:
+                self._query_engines.popitem(last=False)
+        
+        return query_engine
+    
+    def _build_filter_sets(
+        self,
+        tickers: Optional[List[str]],
+        fiscal_years: Optional[List[int]]
+    ) -> List[Optional[MetadataFilters]]:
+        """Build one metadata filter set per ticker/year combination"""
+        
+        filter_sets = []
+        
+        for ticker in tickers or [None]:
+            for fiscal_year in fiscal_years or [None]:
+                filter_list = []
+                
+                if ticker:
+                    filter_list.append(
+                        MetadataFilter(key="ticker", value=ticker, operator=FilterOperator.EQ)
+                    )
+                
+                if fiscal_year:
+                    # Numeric values are compared numerically by PGVectorStore
+                    filter_list.append(
+                        MetadataFilter(key="fiscal_year", value=fiscal_year, operator=FilterOperator.EQ)
+                    )
+                
+                filter_sets.append(MetadataFilters(filters=filter_list) if filter_list else None)
+        
+        return filter_sets
+    
+    def _build_postprocessors(self, filter_sets: List[Optional[MetadataFilters]]) -> Optional[List]:
+        """
+        Reranker keeping SIMILARITY_TOP_K chunks per filter set
+        
+        A fan-out over several tickers/years reranks the union of their
+        candidates, so it keeps as many chunks as the searches would have
+        returned without reranking. The copy shares the loaded cross-encoder.
+        """
+        
+        if not self.reranker:
+            return None
+        
+        return [self.reranker.copy(update={"top_n": SIMILARITY_TOP_K * len(filter_sets)})]
+    
+    def _build_retriever(self, filter_sets: List[Optional[MetadataFilters]]) -> BaseRetriever:
+        """Single vector retriever, or a concurrent fan-out over several filter sets"""
+        
+        # With a reranker, over-fetch cheap HNSW candidates for it to narrow down
+        top_k = RERANK_CANDIDATES if self.reranker else SIMILARITY_TOP_K
+        
+        retrievers = [
+            self.index.as_retriever(similarity_top_k=top_k, filters=filters)
+            for filters in filter_sets
+        ]
+        
+        if len(retrievers) == 1:
+            return retrievers[0]
+        
+        return FanOutRetriever(retrievers, self.embed_model, self._query_pool)
+
+
+# Example usage
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
+    analyzer = MultiCompanyStockAnalyzer()
+    
+    questions = [
+        "What are the main risk factors?",
+        "How did revenue change compared to the prior year?",
+        "What does the company say about competition?",
+    ]
+    
+    async def ask_all() -> List[Dict]:
+        # Independent questions, so their LLM round-trips overlap
+        return await asyncio.gather(*(analyzer.aask(question) for question in questions))
+    
+    for question, result in zip(questions, asyncio.run(ask_all())):
+        print(f"\nQ: {question}")
+        print(f"A: {result['answer']}")
+        print(f"   ({result.get('num_sources', 0)} sources)")
@@ -3,15 +3,235 @@ Improved 10-K Structured Data Extractor - Multi-Year Support with Apple Fix
 Handles inconsistent column spacing and multiple table formats
 """
 
-from bs4 import BeautifulSoup
+from lxml import etree
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional, Dict, List
 from datetime import datetime
+import multiprocessing
+import os
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# SEC header fields, one named group per field (one pass over the header)
+_HEADER_RE = re.compile(
+    r'^[ \t]*(?:'
+    r'COMPANY CONFORMED NAME:[ \t]*(?P<company_name>.+)'
+    r'|CENTRAL INDEX KEY:[ \t]*(?P<cik>\d+)'
+    r'|ACCESSION NUMBER:[ \t]*(?P<accession>\S+)'
+    r'|FILED AS OF DATE:[ \t]*(?P<filing_date>\d{8})'
+    r'|FISCAL YEAR END:[ \t]*(?P<fiscal_year_end>\d{4})'
+    r')',
+    re.MULTILINE
+)
+
+# Year column headers. _HEADER_DATE_RE tries, in priority order: a full
+# date anywhere ("September 28, 2024"), a bare year ("2024"), then a year
+# anywhere in the cell - one match() per cell instead of three searches
+_HEADER_DATE_RE = re.compile(
+    r'^(?:'
+    r'.*?(?P<full>(jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october|nov|november|dec|december)\s+\d{1,2},?\s+(?P<full_year>\d{4}))'
+    r'|\s*(?P<year_only>20\d{2})\s*$'
+    r'|.*?\b(?P<anywhere>20\d{2})\b'
+    r')',
+    re.IGNORECASE | re.DOTALL
+)
+_YEAR_RE = re.compile(r'\b(20\d{2})\b')
+
+# A header cell that is exactly a date ("September 28, 2024" / "Sep 28 2024")
+_EXACT_DATE_RE = re.compile(r'(?P<month>[a-z]+)\s+(?P<day>\d{1,2})\s+(?P<year>\d{4})', re.IGNORECASE)
+_MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6,
+    'jul': 7, 'july': 7, 'aug': 8, 'august': 8, 'sep': 9, 'september': 9,
+    'oct': 10, 'october': 10, 'nov': 11, 'november': 11, 'dec': 12, 'december': 12,
+}
+
+# The SEC header (company, CIK, dates) sits at the top of the submission
+_SEC_HEADER_CHARS = 8192
+
+# Tree traversal (compiled once, evaluated in C by libxml2)
+_ROWS_XPATH = etree.XPath('.//tr')
+_CELLS_XPATH = etree.XPath('.//*[self::td or self::th]')
+_TEXT_XPATH = etree.XPath('string()', smart_strings=False)
+
+# Characters dropped from a cell before it is read as a number
+_NUMBER_DELETE = str.maketrans('', '', '$ ,')
+_NUMBER_DELETE_BYTES = b'$ ,'
+
+# First characters a numeric cell can start with, both as str characters and
+# as the ints that indexing a bytes object returns
+_NUMERIC_START = frozenset('+-.0123456789(') | frozenset(b'+-.0123456789(')
+
+# Where a year column's value sits, relative to its header cell, in try order.
+# Apple's tables have inconsistent spacing:
+# - FY 2025: Year col 1 → Value col 2 (offset +1)
+# - FY 2024: Year col 3 → Value col 6 (offset +3)
+# - FY 2023: Year col 5 → Value col 6 (offset +1)
+_VALUE_COL_OFFSETS = (
+    1,  # Most common: next column
+    2,  # Sometimes: Year | $ | Value
+    3,  # Apple: Year | empty | $ | Value
+    4,  # More spacing
+    0,  # Fallback: same column
+)
+
+# Log names per statement type
+_STATEMENT_NAMES = {
+    'income': 'income statement',
+    'balance': 'balance sheet',
+    'cashflow': 'cash flow statement',
+}
+
+# Phrases any income statement, balance sheet or cash flow table contains
+_STATEMENT_PROBE_RE = re.compile(r'statements|net sales|balance sheets', re.IGNORECASE)
+
+# Table classification phrases ("consolidated statements of income" is
+# covered by "statements of income", and so on)
+_CONSOLIDATED_PHRASES = frozenset(('consolidated statements', 'consolidated income', 'consolidated balance'))
+_INCOME_PHRASES = frozenset(('statements of income', 'statements of operations'))
+_NET_SALES_PHRASES = frozenset(('net sales', 'income'))
+_TABLE_SCANNER = re.compile(
+    '(?=(' + '|'.join(re.escape(phrase) for phrase in sorted(
+        _CONSOLIDATED_PHRASES | _INCOME_PHRASES | _NET_SALES_PHRASES
+        | {'balance sheets', 'statements of cash flows'}
+    )) + '))',
+    re.IGNORECASE
+)
+
+# Line items: (metric field, log label, row keywords, extra row check).
+# Rules are tried in order and the first match wins.
+_INCOME_ROWS = (
+    ('revenue', 'Revenue', ('net sales',),
+     lambda row_text: 'cost' not in row_text),
+    ('cost_of_revenue', 'Cost', ('cost of sales', 'cost of revenue', 'cost of products and services'),
+     None),
+    ('gross_profit', 'Gross Profit', ('gross margin', 'gross profit'),
+     None),
+    ('research_development', 'R&D', ('research and development', 'research & development'),
+     None),
+    ('selling_general_admin', 'SG&A', ('selling, general and administrative', 'sales, general and administrative'),
+     None),
+    ('operating_expenses', 'Op Exp', ('total operating expenses',),
+     lambda row_text: 'income' not in row_text),
+    ('operating_income', 'Op Income', ('operating income', 'income from operations'),
+     lambda row_text: 'non-operating' not in row_text),
+    ('net_income', 'Net Income', ('net income',),
+     lambda row_text: row_text.strip().startswith('net income') and 'diluted' not in row_text and 'basic' not in row_text),
+)
+
+_BALANCE_ROWS = (
+    ('total_assets', 'Total Assets', ('total assets',),
+     lambda row_text: 'liabilities' not in row_text),
+    ('total_liabilities', 'Total Liabilities', ('total liabilities',),
+     None),
+    ('stockholders_equity', 'Equity', ('total stockholders', "total shareholders' equity"),
+     None),
+    ('cash_and_equivalents', 'Cash', ('cash and cash equivalents',),
+     lambda row_text: 'restricted' not in row_text),
+)
+
+_CASHFLOW_ROWS = (
+    ('operating_cash_flow', 'Operating Cash Flow', ('net cash provided by operating activities', 'net cash from operating activities'),
+     None),
+)
+
+
+class _Money:
+    """Log argument that formats an amount with thousands separators only if the record is emitted"""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value: float):
+        self.value = value
+    
+    def __str__(self) -> str:
+        return f"{self.value:,.0f}"
+
+
+def _keyword_scanner(rules) -> re.Pattern:
+    """
+    One case-insensitive regex that reports every rule keyword in a row
+    (overlaps included), so raw row text can be probed before lowercasing
+    """
+    keywords = [keyword for _, _, row_keywords, _ in rules for keyword in row_keywords]
+    return re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in keywords) + '))', re.IGNORECASE)
+
+
+_INCOME_SCANNER = _keyword_scanner(_INCOME_ROWS)
+_BALANCE_SCANNER = _keyword_scanner(_BALANCE_ROWS)
+_CASHFLOW_SCANNER = _keyword_scanner(_CASHFLOW_ROWS)
+
+
+def _classify_row(row_text: str, found: List[str], rules) -> Optional[tuple]:
+    """
+    Find which metric a row holds
+    
+    Args:
+        row_text: Lowercased row text
+        found: Keywords the scanner reported in the raw row text
+        rules: Line-item rules (see _INCOME_ROWS)
+    
+    Returns:
+        (metric field, log label), or None if the row is not a tracked line item
+    """
+    found = {keyword.lower() for keyword in found}
+    
+    for metric, label, row_keywords, accept in rules:
+        if not found.isdisjoint(row_keywords) and (accept is None or accept(row_text)):
+            return metric, label
+    
+    return None
+
+
+def _iter_tables(file_path: str) -> Iterator[etree._Element]:
+    """
+    Stream <table> elements from a filing without building the whole DOM
+    
+    Once the caller is done with a top-level table, it is cleared together
+    with everything parsed before it, so memory stays around one table
+    instead of the whole (often 20+ MB) document. Nested tables are left
+    intact until their outer table has been handled. An empty document (e.g.
+    a truncated download) yields no tables.
+    """
+    
+    context = etree.iterparse(
+        file_path,
+        events=('end',),
+        tag='table',
+        html=True,
+        huge_tree=True,
+        encoding='utf-8'
+    )
+    
+    try:
+        for _, table in context:
+            yield table
+            
+            if next(table.iterancestors('table'), None) is None:
+                table.clear(keep_tail=True)
+                
+                # Drop already-processed siblings of the table and its ancestors
+                node = table
+                while node.getparent() is not None:
+                    parent = node.getparent()
+                    while node.getprevious() is not None:
+                        del parent[0]
+                    node = parent
+    
+    except etree.XMLSyntaxError as e:
+        # The HTML parser recovers from bad markup; this means there was none
+        logger.warning(f"⚠️  No parsable HTML in {file_path}: {e}")
+
+
+def _text(element: etree._Element) -> str:
+    """All text inside an element (XPath string(), built in C by libxml2)"""
+    return _TEXT_XPATH(element)
+
 
 class FilingMetadata(BaseModel):
     """Metadata from 10-K filing"""
@@ -22,8 +242,15 @@ class FilingMetadata(BaseModel):
     fiscal_year_end: datetime
 
 
-class KeyMetrics(BaseModel):
-    """Key financial metrics extracted from 10-K"""
+@dataclass(slots=True)
+class KeyMetrics:
+    """
+    Key financial metrics extracted from 10-K
+    
+    A plain slotted dataclass rather than a Pydantic model: it is created
+    per year column and mutated field by field while tables are parsed,
+    so assignments should be simple slot stores without validation.
+    """
     revenue: Optional[float] = None
     cost_of_revenue: Optional[float] = None
     gross_profit: Optional[float] = None
@@ -41,12 +268,30 @@ class KeyMetrics(BaseModel):
     operating_cash_flow: Optional[float] = None
 
 
+# KeyMetrics field names, and a getter for all their values as one tuple
+_KM_FIELDS: tuple = tuple(f.name for f in fields(KeyMetrics))
+_key_metric_values = attrgetter(*_KM_FIELDS)
+
+
+@dataclass(slots=True)
+class _YearColumn:
+    """One year column of a statement table and the metrics read from it"""
+    col_idx: int
+    fiscal_year_end: datetime
+    metrics: KeyMetrics
+
+
 class Structured10K(BaseModel):
     """Complete structured 10-K data"""
     metadata: FilingMetadata
     key_metrics: KeyMetrics
 
 
+def _extract_all_years_worker(file_path: str) -> List[Structured10K]:
+    """Parse one filing inside an extraction worker process"""
+    return TenKStructuredExtractor().extract_all_years(file_path)
+
+
 class TenKStructuredExtractor:
     """Extract structured data from 10-K HTML filings - supports multi-year extraction"""
     
@@ -69,6 +314,39 @@ class TenKStructuredExtractor:
         all_years = self.extract_all_years(file_path)
         return all_years[0] if all_years else None
     
+    def extract_batch(
+        self,
+        file_paths: List[str],
+        max_workers: Optional[int] = None
+    ) -> Dict[str, List[Structured10K]]:
+        """
+        Extract all years from several filings in parallel
+        
+        Filings are independent and parsing is CPU-bound, so each one is
+        handled in its own worker process (side-stepping the GIL).
+        
+        Args:
+            file_paths: Paths to 10-K HTML files
+            max_workers: Worker processes (default: one per filing, up to CPU count)
+        
+        Returns:
+            Dict mapping each file path to its extract_all_years() result
+        """
+        
+        if len(file_paths) <= 1:
+            return {file_path: self.extract_all_years(file_path) for file_path in file_paths}
+        
+        max_workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+        
+        # Spawned (not forked) workers, as the caller may have live threads and
+        # database connections that a fork would copy mid-use
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            results = pool.map(_extract_all_years_worker, file_paths)
+            return dict(zip(file_paths, results))
+    
     def extract_all_years(self, file_path: str) -> List[Structured10K]:
         """
         Extract structured data for ALL years in the 10-K filing
@@ -83,15 +361,13 @@ class TenKStructuredExtractor:
         self.logger.info(f"Extracting data from {file_path}")
         
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'lxml')
+            header = f.read(_SEC_HEADER_CHARS)
         
         # Extract metadata (same for all years in filing)
-        base_metadata = self._extract_metadata(content, soup)
+        base_metadata = self._extract_metadata(header)
         
-        # Extract financial metrics for all years
-        all_years_metrics = self._extract_all_years_metrics(soup, base_metadata)
+        # Extract financial metrics for all years (tables are streamed from disk)
+        all_years_metrics = self._extract_all_years_metrics(file_path, base_metadata)
         
         # Create Structured10K for each year
         results = []
@@ -103,40 +379,37 @@ class TenKStructuredExtractor:
                 cik=base_metadata.cik,
                 accession_number=base_metadata.accession_number,
                 filing_date=base_metadata.filing_date,
-                fiscal_year_end=year_data['fiscal_year_end']
+                fiscal_year_end=year_data.fiscal_year_end
             )
             
             results.append(Structured10K(
                 metadata=year_metadata,
-                key_metrics=year_data['metrics']
+                key_metrics=year_data.metrics
             ))
         
         self.logger.info(f"✅ Extracted {len(results)} years of data")
         
         return results
     
-    def _extract_metadata(self, content: str, soup: BeautifulSoup) -> FilingMetadata:
-        """Extract filing metadata from SEC header"""
+    def _extract_metadata(self, content: str) -> FilingMetadata:
+        """Extract filing metadata from the SEC header (first few KB of the filing)"""
         
-        company_match = re.search(r'COMPANY CONFORMED NAME:\s*(.+)', content)
-        company_name = company_match.group(1).strip() if company_match else "Unknown"
+        # The header is at the top; keep the first value seen for each field
+        header_fields = {}
+        for match in _HEADER_RE.finditer(content, 0, _SEC_HEADER_CHARS):
+            header_fields.setdefault(match.lastgroup, match.group(match.lastgroup).strip())
         
-        cik_match = re.search(r'CENTRAL INDEX KEY:\s*(\d+)', content)
-        cik = cik_match.group(1).strip() if cik_match else "0000000000"
+        company_name = header_fields.get('company_name', "Unknown")
+        cik = header_fields.get('cik', "0000000000")
+        accession = header_fields.get('accession', "0000000000-00-000000")
         
-        accession_match = re.search(r'ACCESSION NUMBER:\s*(\S+)', content)
-        accession = accession_match.group(1).strip() if accession_match else "0000000000-00-000000"
-        
-        filing_date_match = re.search(r'FILED AS OF DATE:\s*(\d{8})', content)
-        if filing_date_match:
-            date_str = filing_date_match.group(1)
-            filing_date = datetime.strptime(date_str, "%Y%m%d")
+        if 'filing_date' in header_fields:
+            filing_date = datetime.strptime(header_fields['filing_date'], "%Y%m%d")
         else:
             filing_date = datetime.now()
         
-        fiscal_match = re.search(r'FISCAL YEAR END:\s*(\d{4})', content)
-        if fiscal_match:
-            month_day = fiscal_match.group(1)
+        if 'fiscal_year_end' in header_fields:
+            month_day = header_fields['fiscal_year_end']
             fiscal_year_end = datetime.strptime(f"{filing_date.year}{month_day}", "%Y%m%d")
         else:
             fiscal_year_end = filing_date
@@ -149,168 +422,126 @@ class TenKStructuredExtractor:
             fiscal_year_end=fiscal_year_end
         )
     
-    def _extract_all_years_metrics(self, soup: BeautifulSoup, filing_metadata: FilingMetadata) -> List[Dict]:
+    def _extract_all_years_metrics(self, file_path: str, filing_metadata: FilingMetadata) -> List[_YearColumn]:
         """
         Extract key financial metrics for ALL years in the filing
         Process consolidated statements LAST to ensure they override segment data
         
         Returns:
-            List of dicts, each containing fiscal_year_end and KeyMetrics
+            List of _YearColumn, each with fiscal_year_end and KeyMetrics
         """
         
-        all_years = []
-        tables = soup.find_all('table')
-        
-        self.logger.info(f"Found {len(tables)} tables in filing")
+        # One entry per fiscal year; later tables are merged into it
+        all_years_by_year: Dict[int, _YearColumn] = {}
         
         # Separate consolidated and non-consolidated tables
         consolidated_tables = []
         segment_tables = []
+        found_statements = set()
+        seen_table_texts = set()
+        table_count = 0
         
-        for table_idx, table in enumerate(tables):
-            table_text = table.get_text().lower()
+        for table_idx, table in enumerate(_iter_tables(file_path)):
+            table_count += 1
+            raw_text = _text(table)
             
             # Skip table of contents
-            if 'page' in table_text[:500]:
+            if 'page' in raw_text[:500].lower():
+                continue
+            
+            # Cheap probe: every statement below needs one of these phrases,
+            # so most tables are dropped before the full phrase scan
+            if not _STATEMENT_PROBE_RE.search(raw_text):
                 continue
             
+            # Full submissions often repeat a statement verbatim (e.g. in an
+            # exhibit); an identical table parses to identical years, so skip it
+            if raw_text in seen_table_texts:
+                self.logger.debug("   ♻️  Table %d repeats an earlier table, skipping", table_idx)
+                continue
+            seen_table_texts.add(raw_text)
+            
+            # One scan reports every classification phrase in the table
+            phrases = {phrase.lower() for phrase in _TABLE_SCANNER.findall(raw_text)}
+            
             # Check if it's a consolidated statement
-            is_consolidated = any(keyword in table_text for keyword in [
-                'consolidated statements',
-                'consolidated income',
-                'consolidated balance'
-            ])
+            is_consolidated = not phrases.isdisjoint(_CONSOLIDATED_PHRASES)
             
             # Categorize income statements
-            if any(keyword in table_text for keyword in [
-                'consolidated statements of income',
-                'consolidated statements of operations',
-                'statements of income',
-                'statements of operations'
-            ]) or ('net sales' in table_text and 'income' in table_text):
-                
-                if is_consolidated:
-                    consolidated_tables.append(('income', table_idx, table))
-                else:
-                    segment_tables.append(('income', table_idx, table))
+            if not phrases.isdisjoint(_INCOME_PHRASES) or _NET_SALES_PHRASES <= phrases:
+                stmt_type = 'income'
             
             # Categorize balance sheets
-            elif any(keyword in table_text for keyword in [
-                'consolidated balance sheets',
-                'balance sheets'
-            ]):
-                if is_consolidated:
-                    consolidated_tables.append(('balance', table_idx, table))
-                else:
-                    segment_tables.append(('balance', table_idx, table))
+            elif 'balance sheets' in phrases:
+                stmt_type = 'balance'
             
             # Categorize cash flow statements
-            elif any(keyword in table_text for keyword in [
-                'consolidated statements of cash flows',
-                'statements of cash flows'
-            ]):
-                if is_consolidated:
-                    consolidated_tables.append(('cashflow', table_idx, table))
-                else:
-                    segment_tables.append(('cashflow', table_idx, table))
+            elif 'statements of cash flows' in phrases:
+                stmt_type = 'cashflow'
+            
+            else:
+                continue
+            
+            # Parse right away: the streamed table is released once we move on
+            self.logger.info("✅ Found %s in table %d", _STATEMENT_NAMES[stmt_type], table_idx)
+            found_statements.add(stmt_type)
+            
+            if stmt_type == 'income':
+                years_data = self._extract_multi_year_income_statement(table)
+            elif stmt_type == 'balance':
+                years_data = self._extract_multi_year_balance_sheet(table)
+            else:
+                years_data = self._extract_multi_year_cash_flow(table)
+            
+            if is_consolidated:
+                consolidated_tables.append((stmt_type, table_idx, years_data))
+            else:
+                segment_tables.append((stmt_type, table_idx, years_data))
         
-        # Process segment tables FIRST, then consolidated tables LAST
-        # This ensures consolidated data takes precedence
-        income_found = False
-        balance_found = False
-        cashflow_found = False
+        self.logger.info(f"Scanned {table_count} tables in filing")
         
+        # Merge segment tables FIRST, then consolidated tables LAST
+        # This ensures consolidated data takes precedence
         for tables_to_process in [segment_tables, consolidated_tables]:
-            for stmt_type, table_idx, table in tables_to_process:
-                if stmt_type == 'income':
-                    self.logger.info(f"✅ Found income statement in table {table_idx}")
-                    income_found = True
-                    years_data = self._extract_multi_year_income_statement(table)
-                    
-                    if years_data:
-                        self.logger.info(f"   📊 Extracted {len(years_data)} years from income statement")
-                        for year_data in years_data:
-                            existing = next((y for y in all_years if y['fiscal_year_end'] == year_data['fiscal_year_end']), None)
+            for stmt_type, table_idx, years_data in tables_to_process:
+                if years_data:
+                    self.logger.info("   📊 Extracted %d years from %s", len(years_data), _STATEMENT_NAMES[stmt_type])
+                    for year_data in years_data:
+                        fy = year_data.fiscal_year_end.year
+                        existing = all_years_by_year.get(fy)
+                        
+                        if existing:
+                            # The year's end date comes from its table with the
+                            # largest revenue (as when years were kept per date)
+                            new_revenue = year_data.metrics.revenue
+                            if new_revenue is not None and (existing.metrics.revenue is None or new_revenue > existing.metrics.revenue):
+                                existing.fiscal_year_end = year_data.fiscal_year_end
                             
-                            if existing:
-                                self._merge_metrics(existing['metrics'], year_data['metrics'], is_consolidated=(tables_to_process == consolidated_tables))
-                            else:
-                                all_years.append(year_data)
-                    else:
-                        self.logger.warning(f"   ⚠️  Could not parse income statement in table {table_idx}")
-                
-                elif stmt_type == 'balance':
-                    self.logger.info(f"✅ Found balance sheet in table {table_idx}")
-                    balance_found = True
-                    years_data = self._extract_multi_year_balance_sheet(table)
-                    
-                    if years_data:
-                        self.logger.info(f"   📊 Extracted {len(years_data)} years from balance sheet")
-                        for year_data in years_data:
-                            existing = next((y for y in all_years if y['fiscal_year_end'] == year_data['fiscal_year_end']), None)
-                            
-                            if existing:
-                                self._merge_metrics(existing['metrics'], year_data['metrics'], is_consolidated=(tables_to_process == consolidated_tables))
-                            else:
-                                all_years.append(year_data)
-                    else:
-                        self.logger.warning(f"   ⚠️  Could not parse balance sheet in table {table_idx}")
-                
-                elif stmt_type == 'cashflow':
-                    self.logger.info(f"✅ Found cash flow statement in table {table_idx}")
-                    cashflow_found = True
-                    years_data = self._extract_multi_year_cash_flow(table)
-                    
-                    if years_data:
-                        self.logger.info(f"   📊 Extracted {len(years_data)} years from cash flow")
-                        for year_data in years_data:
-                            existing = next((y for y in all_years if y['fiscal_year_end'] == year_data['fiscal_year_end']), None)
-                            
-                            if existing:
-                                self._merge_metrics(existing['metrics'], year_data['metrics'], is_consolidated=(tables_to_process == consolidated_tables))
-                            else:
-                                all_years.append(year_data)
-                    else:
-                        self.logger.warning(f"   ⚠️  Could not parse cash flow in table {table_idx}")
-        
-        # Deduplicate: Keep only ONE entry per fiscal year
-        # Preference: consolidated > larger revenue > first found
-        unique_years = {}
-        
-        for year_data in all_years:
-            fy = year_data['fiscal_year_end'].year
-            
-            if fy not in unique_years:
-                unique_years[fy] = year_data
-            else:
-                # Already have this year - compare and keep the better one
-                existing_revenue = unique_years[fy]['metrics'].revenue
-                new_revenue = year_data['metrics'].revenue
-                
-                # If new has revenue and existing doesn't, or new is larger, use new
-                if new_revenue is not None:
-                    if existing_revenue is None or new_revenue > existing_revenue:
-                        self.logger.info(f"   📊 Updated FY {fy} revenue: {new_revenue:,.0f}")
-                        unique_years[fy] = year_data
+                            self._merge_metrics(existing.metrics, year_data.metrics, is_consolidated=(tables_to_process == consolidated_tables))
+                        else:
+                            all_years_by_year[fy] = year_data
+                else:
+                    self.logger.warning("   ⚠️  Could not parse %s in table %d", _STATEMENT_NAMES[stmt_type], table_idx)
         
-        all_years = list(unique_years.values())
-        self.logger.info(f"   🔄 Deduplicated to {len(all_years)} unique fiscal years")
+        # Already one entry per fiscal year (_merge_metrics reconciled duplicates)
+        all_years = list(all_years_by_year.values())
+        self.logger.info(f"   🔄 Merged into {len(all_years)} unique fiscal years")
         
         # Sort by fiscal year (most recent first)
-        all_years.sort(key=lambda x: x['fiscal_year_end'], reverse=True)
+        all_years.sort(key=lambda x: x.fiscal_year_end, reverse=True)
         
         # FILTER: Only keep years within reasonable range of filing date
         filing_year = filing_metadata.filing_date.year
         filtered_years = []
         
         for year_data in all_years:
-            year = year_data['fiscal_year_end'].year
+            year = year_data.fiscal_year_end.year
             years_diff = abs(filing_year - year)
             
             if years_diff <= 5 and year >= (filing_year - 4):
                 filtered_years.append(year_data)
             else:
-                self.logger.debug(f"   🗑️  Filtered out FY {year} (too old, {years_diff} years from filing date)")
+                self.logger.debug("   🗑️  Filtered out FY %d (too old, %d years from filing date)", year, years_diff)
         
         if filtered_years:
             all_years = filtered_years
@@ -318,9 +549,9 @@ class TenKStructuredExtractor:
         
         # Summary log
         self.logger.info(f"📈 EXTRACTION SUMMARY:")
-        self.logger.info(f"   Income Statement: {'✅ Found' if income_found else '❌ Not Found'}")
-        self.logger.info(f"   Balance Sheet: {'✅ Found' if balance_found else '❌ Not Found'}")
-        self.logger.info(f"   Cash Flow: {'✅ Found' if cashflow_found else '❌ Not Found'}")
+        self.logger.info(f"   Income Statement: {'✅ Found' if 'income' in found_statements else '❌ Not Found'}")
+        self.logger.info(f"   Balance Sheet: {'✅ Found' if 'balance' in found_statements else '❌ Not Found'}")
+        self.logger.info(f"   Cash Flow: {'✅ Found' if 'cashflow' in found_statements else '❌ Not Found'}")
         self.logger.info(f"   Total years extracted (after filtering): {len(all_years)}")
         
         if not all_years:
@@ -328,72 +559,74 @@ class TenKStructuredExtractor:
         
         return all_years
     
-    def _extract_multi_year_income_statement(self, table) -> List[Dict]:
-        """Extract metrics from income statement - APPLE FIXED WITH DYNAMIC COLUMN DETECTION"""
+    def _extract_multi_year_income_statement(self, table: etree._Element) -> List[_YearColumn]:
+        """Extract metrics from income statement (headers may carry full dates)"""
+        return self._extract_table(table, _INCOME_SCANNER, _INCOME_ROWS, detect_dates=True, min_abs_value=10)
+    
+    def _extract_multi_year_balance_sheet(self, table: etree._Element) -> List[_YearColumn]:
+        """Extract metrics from balance sheet"""
+        return self._extract_table(table, _BALANCE_SCANNER, _BALANCE_ROWS, detect_dates=False, min_abs_value=0)
+    
+    def _extract_multi_year_cash_flow(self, table: etree._Element) -> List[_YearColumn]:
+        """Extract metrics from cash flow statement"""
+        return self._extract_table(table, _CASHFLOW_SCANNER, _CASHFLOW_ROWS, detect_dates=False, min_abs_value=0)
+    
+    def _extract_table(
+        self,
+        table: etree._Element,
+        scanner: re.Pattern,
+        rules,
+        detect_dates: bool,
+        min_abs_value: float
+    ) -> List[_YearColumn]:
+        """
+        Extract one statement's metrics for every year column - APPLE FIXED WITH DYNAMIC COLUMN DETECTION
+        
+        Args:
+            table: <table> element
+            scanner: Keyword scanner for the statement's rules
+            rules: Line-item rules (see _INCOME_ROWS)
+            detect_dates: Read full dates ("September 28, 2024") from headers
+            min_abs_value: Ignore candidate cells smaller than this (footnote markers etc.)
+        
+        Returns:
+            List of _YearColumn (column index, fiscal_year_end and KeyMetrics)
+        """
         
-        rows = table.find_all('tr')
+        rows = _ROWS_XPATH(table)
         if not rows:
             return []
         
+        # Snapshot every row's text once; the header and data passes both read it
+        row_texts: List[str] = [_text(row) for row in rows]
+        
         # Get header text from multiple rows
-        header_text = ' '.join([r.get_text().lower() for r in rows[:3]])
+        header_text = ' '.join(row_texts[:3]).lower()
         
         # Determine unit multiplier
-        unit_multiplier = 1_000_000 if 'millions' in header_text or '$ in millions' in header_text else 1_000
+        unit_multiplier = 1_000_000 if 'millions' in header_text else 1_000
         
         # CHECK FIRST 5 ROWS FOR YEARS
-        year_columns = []
-        year_row_idx = None
+        year_columns: List[_YearColumn] = []
+        year_row_idx: Optional[int] = None
         
         for header_row_idx in range(min(5, len(rows))):
-            header_cells = rows[header_row_idx].find_all(['th', 'td'])
+            header_cells = _CELLS_XPATH(rows[header_row_idx])
             
             for col_idx in range(len(header_cells)):
-                cell_text = header_cells[col_idx].get_text().strip()
+                cell_text = _text(header_cells[col_idx]).strip()
                 
                 if not cell_text:
                     continue
                 
-                fiscal_year_end = None
-                year = None
-                
-                # Pattern 1: Full date like "September 28, 2024"
-                year_match = re.search(r'(jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|sep|september|oct|october|nov|november|dec|december)\s+\d{1,2},?\s+(\d{4})', cell_text.lower())
-                
-                if year_match:
-                    year = int(year_match.group(2))
-                    try:
-                        fiscal_year_end = datetime.strptime(cell_text.replace(',', ''), "%B %d %Y")
-                    except:
-                        try:
-                            fiscal_year_end = datetime.strptime(cell_text.replace(',', ''), "%b %d %Y")
-                        except:
-                            fiscal_year_end = datetime(year, 9, 30)
-                
-                # Pattern 2: Just year like "2025", "2024" (APPLE USES THIS)
-                if not year:
-                    year_match = re.search(r'^\s*(20\d{2})\s*$', cell_text)
-                    if year_match:
-                        year = int(year_match.group(1))
-                        fiscal_year_end = datetime(year, 9, 30)
+                fiscal_year_end = self._header_fiscal_year_end(cell_text, detect_dates)
                 
-                # Pattern 3: Year anywhere in text
-                if not year:
-                    year_match = re.search(r'\b(20\d{2})\b', cell_text)
-                    if year_match:
-                        year = int(year_match.group(1))
-                        fiscal_year_end = datetime(year, 12, 31)
-                
-                if year and fiscal_year_end:
+                if fiscal_year_end:
                     # Check if we already have this column index
-                    if not any(yc['col_idx'] == col_idx for yc in year_columns):
-                        year_columns.append({
-                            'col_idx': col_idx,
-                            'fiscal_year_end': fiscal_year_end,
-                            'metrics': KeyMetrics()
-                        })
+                    if not any(yc.col_idx == col_idx for yc in year_columns):
+                        year_columns.append(_YearColumn(col_idx, fiscal_year_end, KeyMetrics()))
                         year_row_idx = header_row_idx
-                        self.logger.info(f"  ✅ Found FY {fiscal_year_end.year} in col {col_idx} (row {header_row_idx})")
+                        self.logger.info("  ✅ Found FY %d in col %d (row %d)", fiscal_year_end.year, col_idx, header_row_idx)
             
             # If we found years in this row, stop checking other rows
             if year_columns:
@@ -403,350 +636,195 @@ class TenKStructuredExtractor:
             self.logger.warning("  ⚠️  No year columns found in any header row")
             return []
         
-        # Determine data start row (Apple: row after years)
-        if year_row_idx is not None:
-            data_start_row = year_row_idx + 1
-            self.logger.info(f"  📍 Data starts at row {data_start_row}")
-        else:
-            data_start_row = 2
+        # Data starts after year row (Apple: row after years)
+        data_start_row = (year_row_idx + 1) if year_row_idx is not None else 2
+        self.logger.info("  📍 Data starts at row %d", data_start_row)
+        
+        # Only these columns can hold a year's value; label cells are never parsed
+        value_cols = sorted({
+            year_col.col_idx + offset
+            for year_col in year_columns
+            for offset in _VALUE_COL_OFFSETS
+        })
         
         # Extract data
-        for row_idx, row in enumerate(rows[data_start_row:], start=data_start_row):
-            row_text = row.get_text().lower()
-            cells = row.find_all(['td', 'th'])
+        for row_idx in range(data_start_row, len(rows)):
+            raw_row_text = row_texts[row_idx]
             
-            if len(cells) < 2:
+            # Case-insensitive probe on the raw text: most rows hold no
+            # tracked keyword and are skipped without being lowercased
+            found = scanner.findall(raw_row_text)
+            if not found:
                 continue
             
-            for year_col in year_columns:
-                year_col_idx = year_col['col_idx']
-                
-                # APPLE FIX: Try multiple column offsets
-                # Apple's tables have inconsistent spacing:
-                # - FY 2025: Year col 1 → Value col 2 (offset +1)
-                # - FY 2024: Year col 3 → Value col 6 (offset +3)
-                # - FY 2023: Year col 5 → Value col 6 (offset +1)
-                attempts = [
-                    year_col_idx + 1,  # Most common: next column
-                    year_col_idx + 2,  # Sometimes: Year | $ | Value
-                    year_col_idx + 3,  # Apple: Year | empty | $ | Value
-                    year_col_idx + 4,  # More spacing
-                    year_col_idx       # Fallback: same column
-                ]
-                
-                value = None
-                value_col_idx = None
-                
-                for try_col in attempts:
-                    if try_col >= len(cells):
-                        continue
-                    
-                    cell_text = cells[try_col].get_text().strip()
-                    
-                    # Skip cells with just "$" or empty
-                    if not cell_text or cell_text == '$':
-                        continue
-                    
-                    cell_value = self._extract_number(cell_text)
-                    
-                    if cell_value is not None and abs(cell_value) >= 10:
-                        value = cell_value
-                        value_col_idx = try_col
-                        break
-                
-                if value is None or abs(value) < 10:
-                    continue
-                
-                value = value * unit_multiplier
-                metrics = year_col['metrics']
-                fy = year_col['fiscal_year_end'].year
-                
-                # Match metrics - SIMPLIFIED PATTERNS
-                
-                # Revenue / Net Sales (prefer "total")
-                if 'net sales' in row_text and 'cost' not in row_text:
-                    is_total = 'total' in row_text
-                    
-                    if metrics.revenue is None:
-                        metrics.revenue = value
-                        self.logger.info(f"    ✅ [FY {fy}] Revenue: ${value:,.0f} (row {row_idx}, col {value_col_idx})")
-                    elif is_total and value > (metrics.revenue or 0):
-                        metrics.revenue = value
-                        self.logger.info(f"    ✅ [FY {fy}] Revenue TOTAL: ${value:,.0f}")
-                
-                # Cost of Sales / Cost of Revenue
-                elif 'cost of sales' in row_text or 'cost of revenue' in row_text or 'cost of products and services' in row_text:
-                    if metrics.cost_of_revenue is None or abs(value) > abs(metrics.cost_of_revenue or 0):
-                        metrics.cost_of_revenue = abs(value)
-                        self.logger.info(f"    ✅ [FY {fy}] Cost: ${value:,.0f}")
-                
-                # Gross Margin / Gross Profit
-                elif 'gross margin' in row_text or 'gross profit' in row_text:
-                    if metrics.gross_profit is None or value > (metrics.gross_profit or 0):
-                        metrics.gross_profit = value
-                        self.logger.info(f"    ✅ [FY {fy}] Gross Profit: ${value:,.0f}")
-                
-                # Research and Development
-                elif 'research and development' in row_text or 'research & development' in row_text:
-                    if metrics.research_development is None or value > (metrics.research_development or 0):
-                        metrics.research_development = value
-                        self.logger.info(f"    ✅ [FY {fy}] R&D: ${value:,.0f}")
-                
-                # SG&A
-                elif 'selling, general and administrative' in row_text or 'sales, general and administrative' in row_text:
-                    if metrics.selling_general_admin is None or value > (metrics.selling_general_admin or 0):
-                        metrics.selling_general_admin = value
-                        self.logger.info(f"    ✅ [FY {fy}] SG&A: ${value:,.0f}")
-                
-                # Total Operating Expenses
-                elif 'total operating expenses' in row_text and 'income' not in row_text:
-                    if metrics.operating_expenses is None or value > (metrics.operating_expenses or 0):
-                        metrics.operating_expenses = value
-                        self.logger.info(f"    ✅ [FY {fy}] Op Exp: ${value:,.0f}")
-                
-                # Operating Income
-                elif ('operating income' in row_text or 'income from operations' in row_text) and 'non-operating' not in row_text:
-                    if metrics.operating_income is None or value > (metrics.operating_income or 0):
-                        metrics.operating_income = value
-                        self.logger.info(f"    ✅ [FY {fy}] Op Income: ${value:,.0f}")
-                
-                # Net Income
-                elif row_text.strip().startswith('net income') and 'diluted' not in row_text and 'basic' not in row_text:
-                    if metrics.net_income is None or value > (metrics.net_income or 0):
-                        metrics.net_income = value
-                        self.logger.info(f"    ✅ [FY {fy}] Net Income: ${value:,.0f}")
-        
-        return year_columns
-    
-    def _extract_multi_year_balance_sheet(self, table) -> List[Dict]:
-        """Extract metrics from balance sheet - APPLE FIXED WITH DYNAMIC COLUMN DETECTION"""
-        
-        rows = table.find_all('tr')
-        if not rows:
-            return []
-        
-        header_text = ' '.join([r.get_text().lower() for r in rows[:3]])
-        unit_multiplier = 1_000_000 if 'millions' in header_text else 1_000
-        
-        # Find year columns
-        year_columns = []
-        year_row_idx = None
-        
-        for header_row_idx in range(min(5, len(rows))):
-            header_cells = rows[header_row_idx].find_all(['th', 'td'])
-            
-            for col_idx in range(len(header_cells)):
-                cell_text = header_cells[col_idx].get_text().strip()
-                
-                year_match = re.search(r'\b(20\d{2})\b', cell_text)
-                if year_match:
-                    year = int(year_match.group(1))
-                    
-                    if not any(yc['col_idx'] == col_idx for yc in year_columns):
-                        year_columns.append({
-                            'col_idx': col_idx,
-                            'fiscal_year_end': datetime(year, 9, 30),
-                            'metrics': KeyMetrics()
-                        })
-                        year_row_idx = header_row_idx
-                        self.logger.info(f"  ✅ Found FY {year} in col {col_idx}")
+            # Decide the line item once per row; untracked rows are skipped
+            row_text: str = raw_row_text.lower()
+            match = _classify_row(row_text, found, rules)
+            if match is None:
+                continue
             
-            if year_columns:
-                break
-        
-        if not year_columns:
-            return []
-        
-        # Data starts after year row
-        data_start_row = (year_row_idx + 1) if year_row_idx is not None else 2
-        
-        # Extract data
-        for row in rows[data_start_row:]:
-            row_text = row.get_text().lower()
-            cells = row.find_all(['td', 'th'])
+            metric, label = match
+            # Cells are only read for tracked rows
+            cells = _CELLS_XPATH(rows[row_idx])
             
             if len(cells) < 2:
                 continue
             
+            # Parse each candidate cell once; every year column probes the same
+            # values (empty, "$"-only and unread cells are None)
+            n_cells = len(cells)
+            cell_values: List[Optional[float]] = [None] * n_cells
+            has_value = False
+            for col in value_cols:
+                if col >= n_cells:
+                    break
+                parsed = self._extract_number(_text(cells[col]))
+                if parsed is not None:
+                    cell_values[col] = parsed
+                    has_value = True
+            
+            # Nothing numeric in the row: no year column can get a value
+            if not has_value:
+                continue
+            
             for year_col in year_columns:
-                year_col_idx = year_col['col_idx']
+                year_col_idx = year_col.col_idx
                 
-                # APPLE FIX: Try multiple column offsets
-                attempts = [
-                    year_col_idx + 1,
-                    year_col_idx + 2,
-                    year_col_idx + 3,
-                    year_col_idx + 4,
-                    year_col_idx
-                ]
+                # Every offset (including the same-column fallback) is past the row
+                if year_col_idx >= n_cells:
+                    continue
                 
-                value = None
+                # APPLE FIX: Try multiple column offsets (see _VALUE_COL_OFFSETS)
+                value: Optional[float] = None
+                value_col_idx: Optional[int] = None
                 
-                for try_col in attempts:
-                    if try_col >= len(cells):
-                        continue
-                    
-                    cell_text = cells[try_col].get_text().strip()
-                    
-                    if not cell_text or cell_text == '$':
+                for offset in _VALUE_COL_OFFSETS:
+                    try_col = year_col_idx + offset
+                    if try_col >= n_cells:
                         continue
                     
-                    cell_value = self._extract_number(cell_text)
+                    cell_value = cell_values[try_col]
                     
-                    if cell_value is not None:
+                    if cell_value is not None and abs(cell_value) >= min_abs_value:
                         value = cell_value
+                        value_col_idx = try_col
                         break
                 
                 if value is None:
                     continue
                 
-                value = value * unit_multiplier
-                metrics = year_col['metrics']
-                fy = year_col['fiscal_year_end'].year
-                
-                # Total Assets
-                if 'total assets' in row_text and 'liabilities' not in row_text:
-                    if metrics.total_assets is None or value > (metrics.total_assets or 0):
-                        metrics.total_assets = value
-                        self.logger.info(f"    ✅ [FY {fy}] Total Assets: ${value:,.0f}")
-                
-                # Total Liabilities
-                elif 'total liabilities' in row_text:
-                    if metrics.total_liabilities is None or value > (metrics.total_liabilities or 0):
-                        metrics.total_liabilities = value
-                        self.logger.info(f"    ✅ [FY {fy}] Total Liabilities: ${value:,.0f}")
-                
-                # Stockholders Equity
-                elif 'total stockholders' in row_text or "total shareholders' equity" in row_text:
-                    if metrics.stockholders_equity is None or value > (metrics.stockholders_equity or 0):
-                        metrics.stockholders_equity = value
-                        self.logger.info(f"    ✅ [FY {fy}] Equity: ${value:,.0f}")
-                
-                # Cash and Cash Equivalents
-                elif 'cash and cash equivalents' in row_text and 'restricted' not in row_text:
-                    if metrics.cash_and_equivalents is None or value > (metrics.cash_and_equivalents or 0):
-                        metrics.cash_and_equivalents = value
-                        self.logger.info(f"    ✅ [FY {fy}] Cash: ${value:,.0f}")
+                self._update_metric(
+                    year_col.metrics, metric, label, value * unit_multiplier,
+                    row_text, year_col.fiscal_year_end.year, row_idx, value_col_idx
+                )
         
         return year_columns
     
-    def _extract_multi_year_cash_flow(self, table) -> List[Dict]:
-        """Extract metrics from cash flow statement - APPLE FIXED WITH DYNAMIC COLUMN DETECTION"""
-        
-        rows = table.find_all('tr')
-        if not rows:
-            return []
+    def _header_fiscal_year_end(self, cell_text: str, detect_dates: bool) -> Optional[datetime]:
+        """Fiscal year end named by a header cell, or None if it has no year"""
         
-        header_text = ' '.join([r.get_text().lower() for r in rows[:3]])
-        unit_multiplier = 1_000_000 if 'millions' in header_text else 1_000
-        
-        # Find year columns
-        year_columns = []
-        year_row_idx = None
-        
-        for header_row_idx in range(min(5, len(rows))):
-            header_cells = rows[header_row_idx].find_all(['th', 'td'])
+        if detect_dates:
+            match = _HEADER_DATE_RE.match(cell_text)
             
-            for col_idx in range(len(header_cells)):
-                cell_text = header_cells[col_idx].get_text().strip()
-                
-                year_match = re.search(r'\b(20\d{2})\b', cell_text)
-                if year_match:
-                    year = int(year_match.group(1))
-                    
-                    if not any(yc['col_idx'] == col_idx for yc in year_columns):
-                        year_columns.append({
-                            'col_idx': col_idx,
-                            'fiscal_year_end': datetime(year, 9, 30),
-                            'metrics': KeyMetrics()
-                        })
-                        year_row_idx = header_row_idx
-                        self.logger.info(f"  ✅ Found FY {year} in col {col_idx}")
-            
-            if year_columns:
-                break
-        
-        if not year_columns:
-            return []
-        
-        # Data starts after year row
-        data_start_row = (year_row_idx + 1) if year_row_idx is not None else 2
-        
-        # Extract data
-        for row in rows[data_start_row:]:
-            row_text = row.get_text().lower()
-            cells = row.find_all(['td', 'th'])
-            
-            if len(cells) < 2:
-                continue
+            if match is None:
+                return None
             
-            for year_col in year_columns:
-                year_col_idx = year_col['col_idx']
-                
-                # APPLE FIX: Try multiple column offsets
-                attempts = [
-                    year_col_idx + 1,
-                    year_col_idx + 2,
-                    year_col_idx + 3,
-                    year_col_idx + 4,
-                    year_col_idx
-                ]
-                
-                value = None
-                
-                for try_col in attempts:
-                    if try_col >= len(cells):
-                        continue
-                    
-                    cell_text = cells[try_col].get_text().strip()
-                    
-                    if not cell_text or cell_text == '$':
-                        continue
-                    
-                    cell_value = self._extract_number(cell_text)
-                    
-                    if cell_value is not None:
-                        value = cell_value
-                        break
-                
-                if value is None:
-                    continue
+            # Pattern 1: Full date like "September 28, 2024". The exact day is
+            # only used when the whole cell is the date; otherwise Sep 30
+            if match.group('full'):
+                date_match = _EXACT_DATE_RE.fullmatch(cell_text.replace(',', ''))
+                month = _MONTHS.get(date_match.group('month').lower()) if date_match else None
                 
-                value = value * unit_multiplier
-                metrics = year_col['metrics']
-                fy = year_col['fiscal_year_end'].year
+                if month:
+                    try:
+                        return datetime(int(date_match.group('year')), month, int(date_match.group('day')))
+                    except ValueError:
+                        pass
                 
-                # Operating Cash Flow
-                if 'net cash provided by operating activities' in row_text or 'net cash from operating activities' in row_text:
-                    if metrics.operating_cash_flow is None or abs(value) > abs(metrics.operating_cash_flow or 0):
-                        metrics.operating_cash_flow = value
-                        self.logger.info(f"    ✅ [FY {fy}] Operating Cash Flow: ${value:,.0f}")
+                return datetime(int(match.group('full_year')), 9, 30)
+            
+            # Pattern 2: Just year like "2025", "2024" (APPLE USES THIS)
+            if match.group('year_only'):
+                return datetime(int(match.group('year_only')), 9, 30)
+            
+            # Pattern 3: Year anywhere in text
+            return datetime(int(match.group('anywhere')), 12, 31)
         
-        return year_columns
+        year_match = _YEAR_RE.search(cell_text)
+        return datetime(int(year_match.group(1)), 9, 30) if year_match else None
+    
+    def _update_metric(
+        self,
+        metrics: KeyMetrics,
+        metric: str,
+        label: str,
+        value: float,
+        row_text: str,
+        fy: int,
+        row_idx: int,
+        col_idx: int
+    ):
+        """Store a line-item value for one year, keeping the best value seen"""
+        
+        current = getattr(metrics, metric)
+        
+        # Revenue / Net Sales (prefer "total")
+        if metric == 'revenue':
+            if current is None:
+                metrics.revenue = value
+                self.logger.info("    ✅ [FY %d] Revenue: $%s (row %d, col %d)", fy, _Money(value), row_idx, col_idx)
+            elif 'total' in row_text and value > (current or 0):
+                metrics.revenue = value
+                self.logger.info("    ✅ [FY %d] Revenue TOTAL: $%s", fy, _Money(value))
+        
+        # Cost is stored as a positive amount
+        elif metric == 'cost_of_revenue':
+            if current is None or abs(value) > abs(current or 0):
+                metrics.cost_of_revenue = abs(value)
+                self.logger.info("    ✅ [FY %d] %s: $%s", fy, label, _Money(value))
+        
+        # Cash flow keeps its sign; the largest magnitude wins
+        elif metric == 'operating_cash_flow':
+            if current is None or abs(value) > abs(current or 0):
+                metrics.operating_cash_flow = value
+                self.logger.info("    ✅ [FY %d] %s: $%s", fy, label, _Money(value))
+        
+        # Everything else: keep the largest value seen
+        elif current is None or value > (current or 0):
+            setattr(metrics, metric, value)
+            self.logger.info("    ✅ [FY %d] %s: $%s", fy, label, _Money(value))
     
     def _merge_metrics(self, existing: KeyMetrics, new: KeyMetrics, is_consolidated: bool = False):
         """
         Merge new metrics into existing metrics with smart logic:
         - For consolidated data (is_consolidated=True), ALWAYS overwrite with consolidated values
-        - For segment data, only fill NULL values
+        - For segment data, only fill NULL values, except that a larger
+          revenue wins (the company total rather than one segment)
+        
+        This is the only place duplicate fiscal years are reconciled.
         """
         
-        for field in KeyMetrics.model_fields:
-            existing_val = getattr(existing, field)
-            new_val = getattr(new, field)
+        # Read every field of both sides in one call each (slotted, so no __dict__)
+        for field, existing_val, new_val in zip(_KM_FIELDS, _key_metric_values(existing), _key_metric_values(new)):
+            # Nothing to merge from an empty field
+            if new_val is None:
+                continue
             
             # If existing is None, always take the new value
-            if existing_val is None and new_val is not None:
+            if existing_val is None:
                 setattr(existing, field, new_val)
             
             # If both have values and this is consolidated data, ALWAYS use consolidated
-            elif existing_val is not None and new_val is not None:
-                if is_consolidated:
-                    # For consolidated data, ALWAYS overwrite with the new value
-                    # Consolidated statements take precedence over segment data
-                    setattr(existing, field, new_val)
-                    if field == 'revenue' and isinstance(new_val, (int, float)):
-                        self.logger.debug(f"   ✅ Merging consolidated {field}: {new_val:,.0f}")
+            elif is_consolidated:
+                # For consolidated data, ALWAYS overwrite with the new value
+                # Consolidated statements take precedence over segment data
+                setattr(existing, field, new_val)
+                if field == 'revenue' and isinstance(new_val, (int, float)):
+                    self.logger.debug("   ✅ Merging consolidated %s: %s", field, _Money(new_val))
+            
+            elif field == 'revenue' and new_val > existing_val:
+                setattr(existing, field, new_val)
+                self.logger.info("   📊 Updated revenue: %s", _Money(new_val))
     
     def _extract_number(self, text: str) -> Optional[float]:
         """
@@ -758,19 +836,29 @@ class TenKStructuredExtractor:
             "1234.56" → 1234.56
         """
         
-        cleaned = text.replace('$', '').replace(' ', '').strip()
+        # Drop currency signs, spaces and thousands separators in one pass.
+        # Nearly all cells are ASCII: bytes.translate deletes in a plain C
+        # loop, and float() parses bytes directly
+        if text.isascii():
+            cleaned = text.encode('ascii').translate(None, _NUMBER_DELETE_BYTES).strip()
+            open_paren, close_paren = b'(', b')'
+        else:
+            cleaned = text.translate(_NUMBER_DELETE).strip()
+            open_paren, close_paren = '(', ')'
+        
+        # Labels and dashes are most non-numeric cells: reject them without
+        # float() raising (this also keeps "nan"/"inf" text out of the metrics)
+        if not cleaned or cleaned[0] not in _NUMERIC_START:
+            return None
         
         # Handle negative numbers in parentheses
         is_negative = False
-        if cleaned.startswith('(') and cleaned.endswith(')'):
+        if cleaned.startswith(open_paren) and cleaned.endswith(close_paren):
             is_negative = True
             cleaned = cleaned[1:-1]
         
-        # Remove commas
-        cleaned = cleaned.replace(',', '')
-        
         try:
             value = float(cleaned)
             return -value if is_negative else value
-        except:
+        except ValueError:
             return None
\ No newline at end of file
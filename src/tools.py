@@ -4,13 +4,62 @@ Tool Definitions with LangFuse Observability
 
 from llama_index.core.tools import FunctionTool
 from langfuse.decorators import observe, langfuse_context
-from typing import List, Dict, Optional
-import json
+from typing import List, Dict, Optional, Union
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import fields
 from sqlalchemy import text
+from src.structured_parser import KeyMetrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Filings kept in the per-factory lookup cache
+FILING_CACHE_SIZE = 512
+
+# Lookups that found no filing are remembered briefly, so an agent retrying
+# the same wrong year does not hit the database each time
+MISS_CACHE_SIZE = 1024
+MISS_CACHE_TTL_SECONDS = 60
+
+# Metrics stored in filings.structured_data (see KeyMetrics)
+COMPARABLE_METRICS = frozenset(field.name for field in fields(KeyMetrics))
+
+# Filing lookups, built once so SQLAlchemy reuses the parsed statements
+_FILING_QUERY = text("""
+    SELECT structured_data 
+    FROM filings f
+    JOIN companies c ON f.company_id = c.id
+    WHERE c.ticker = :ticker 
+      AND f.fiscal_year = :year
+      AND f.filing_type = '10-K'
+""")
+
+_FILING_QUERY_WITH_QUARTER = text("""
+    SELECT structured_data 
+    FROM filings f
+    JOIN companies c ON f.company_id = c.id
+    WHERE c.ticker = :ticker 
+      AND f.fiscal_year = :year
+      AND f.fiscal_quarter = :quarter
+      AND f.filing_type = '10-K'
+""")
+
+# All compared companies in one round trip (tickers binds as an array);
+# only the compared metric is read out of structured_data
+_COMPARISON_QUERY = text("""
+    SELECT c.ticker, CAST(f.structured_data ->> :metric AS float8) AS value 
+    FROM filings f
+    JOIN companies c ON f.company_id = c.id
+    WHERE c.ticker = ANY(:tickers) 
+      AND f.fiscal_year = :year
+      AND f.filing_type = '10-K'
+""")
+
 
 class ToolsFactory:
     """Factory for creating agent tools with observability"""
@@ -27,6 +76,146 @@ class ToolsFactory:
         self.db = db
         self.rag_engine = rag_engine
         self.agent = agent
+        
+        # (ticker, fiscal_year, quarter) -> structured_data, least recently used first.
+        # clear_cache() drops it after new filings are stored
+        self._filing_cache: OrderedDict = OrderedDict()
+        self._filing_cache_lock = threading.Lock()
+        
+        # (ticker, fiscal_year, quarter) -> expiry (time.monotonic()) of a cached miss,
+        # oldest first; guarded by the same lock
+        self._miss_cache: Dict[tuple, float] = {}
+        
+        # Connection shared by connection_scope() (None outside a scope)
+        self._scoped_connection: ContextVar = ContextVar("tools_connection", default=None)
+        
+        # Same switch as the agent's LangFuse setup: tracing needs both keys
+        self._trace = bool(os.getenv("LANGFUSE_PUBLIC_KEY") and os.getenv("LANGFUSE_SECRET_KEY"))
+    
+    @contextmanager
+    def connection_scope(self):
+        """
+        Share one database connection across every tool call in this block
+        (e.g. one agent request), instead of checking one out per call
+        """
+        
+        if self._scoped_connection.get() is not None:
+            yield
+            return
+        
+        with self.db.engine.connect() as conn:
+            token = self._scoped_connection.set(conn)
+            try:
+                yield
+            finally:
+                self._scoped_connection.reset(token)
+    
+    @contextmanager
+    def _connection(self):
+        """Connection for one tool query: the scoped one if set, else a pooled one"""
+        
+        conn = self._scoped_connection.get()
+        if conn is None:
+            with self.db.engine.connect() as conn:
+                yield conn
+            return
+        
+        try:
+            yield conn
+        finally:
+            # End the read transaction the query began: the connection stays
+            # checked out for the whole request, but must not sit idle in a
+            # transaction (holding a snapshot) between tool calls
+            conn.rollback()
+    
+    def _obs(self, **kwargs):
+        """Update the current LangFuse observation (no-op when tracing is off)"""
+        
+        if self._trace:
+            langfuse_context.update_current_observation(**kwargs)
+    
+    def clear_cache(self):
+        """Forget cached filing lookups (call after filings are added or updated)"""
+        
+        with self._filing_cache_lock:
+            self._filing_cache.clear()
+            self._miss_cache.clear()
+    
+    def _cached_filing(self, key: tuple) -> Optional[Dict]:
+        """Return cached structured_data for a lookup key, or None"""
+        
+        with self._filing_cache_lock:
+            data = self._filing_cache.get(key)
+            if data is not None:
+                self._filing_cache.move_to_end(key)
+            return data
+    
+    def _is_cached_miss(self, key: tuple) -> bool:
+        """True if this lookup recently found no filing"""
+        
+        with self._filing_cache_lock:
+            expires = self._miss_cache.get(key)
+            if expires is None:
+                return False
+            if expires > time.monotonic():
+                return True
+            del self._miss_cache[key]
+            return False
+    
+    def _cache_miss(self, key: tuple):
+        """Remember for MISS_CACHE_TTL_SECONDS that this lookup found no filing"""
+        
+        with self._filing_cache_lock:
+            # Re-insert so the dict stays ordered by expiry
+            self._miss_cache.pop(key, None)
+            self._miss_cache[key] = time.monotonic() + MISS_CACHE_TTL_SECONDS
+            if len(self._miss_cache) > MISS_CACHE_SIZE:
+                del self._miss_cache[next(iter(self._miss_cache))]
+    
+    def _fetch_filing(self, ticker: str, fiscal_year: int, quarter: int = None) -> Optional[Dict]:
+        """
+        Get a 10-K's structured data, from the cache when possible
+        
+        Args:
+            ticker: Stock ticker
+            fiscal_year: Fiscal year
+            quarter: Optional fiscal quarter
+        
+        Returns:
+            structured_data dict, or None if no filing matches
+        """
+        
+        key = (ticker, fiscal_year, quarter)
+        data = self._cached_filing(key)
+        if data is not None:
+            return data
+        
+        if self._is_cached_miss(key):
+            return None
+        
+        if quarter:
+            query = _FILING_QUERY_WITH_QUARTER
+            params = {"ticker": ticker, "year": fiscal_year, "quarter": quarter}
+        else:
+            query = _FILING_QUERY
+            params = {"ticker": ticker, "year": fiscal_year}
+        
+        with self._connection() as conn:
+            result = conn.execute(query, params).fetchone()
+        
+        if not (result and result[0]):
+            self._cache_miss(key)
+            return None
+        
+        # JSON columns come back as dicts (see Database: psycopg2 decodes them)
+        data = result[0]
+        
+        with self._filing_cache_lock:
+            self._filing_cache[key] = data
+            if len(self._filing_cache) > FILING_CACHE_SIZE:
+                self._filing_cache.popitem(last=False)
+        
+        return data
     
     def create_all_tools(self) -> List[FunctionTool]:
         """Create all available tools"""
@@ -57,7 +246,7 @@ class ToolsFactory:
             """
             
             # Update trace metadata
-            langfuse_context.update_current_observation(
+            self._obs(
                 metadata={
                     "ticker": ticker,
                     "fiscal_year": fiscal_year,
@@ -68,41 +257,11 @@ class ToolsFactory:
             try:
                 logger.info(f"\n🔧 Tool: get_financial_data({ticker}, {fiscal_year}, quarter={quarter})")
                 
-                # Build query
-                if quarter:
-                    query = text("""
-                        SELECT structured_data 
-                        FROM filings f
-                        JOIN companies c ON f.company_id = c.id
-                        WHERE c.ticker = :ticker 
-                          AND f.fiscal_year = :year
-                          AND f.fiscal_quarter = :quarter
-                          AND f.filing_type = '10-K'
-                    """)
-                    params = {"ticker": ticker, "year": fiscal_year, "quarter": quarter}
-                else:
-                    query = text("""
-                        SELECT structured_data 
-                        FROM filings f
-                        JOIN companies c ON f.company_id = c.id
-                        WHERE c.ticker = :ticker 
-                          AND f.fiscal_year = :year
-                          AND f.filing_type = '10-K'
-                    """)
-                    params = {"ticker": ticker, "year": fiscal_year}
-                
-                with self.db.engine.connect() as conn:
-                    result = conn.execute(query, params).fetchone()
+                financial_data = self._fetch_filing(ticker, fiscal_year, quarter)
                 
-                if result and result[0]:
-                    # JSONB column returns dict directly (not string)
-                    financial_data = result[0]
-                    
-                    # Handle case where it might be a string (shouldn't happen with JSONB)
-                    if isinstance(financial_data, str):
-                        financial_data = json.loads(financial_data)
-                    
-                    logger.info(f"   ✅ Found data: {list(financial_data.keys())}")
+                if financial_data:
+                    data_keys = list(financial_data)
+                    logger.info(f"   ✅ Found data: {data_keys}")
                     
                     output = {
                         "ticker": ticker,
@@ -112,9 +271,9 @@ class ToolsFactory:
                     }
                     
                     # Update observation with success
-                    langfuse_context.update_current_observation(
+                    self._obs(
                         output=output,
-                        metadata={"success": True, "data_keys": list(financial_data.keys())}
+                        metadata={"success": True, "data_keys": data_keys}
                     )
                     
                     return output
@@ -122,7 +281,7 @@ class ToolsFactory:
                     msg = f"No financial data found for {ticker} in {fiscal_year}"
                     logger.warning(f"   ⚠️  {msg}")
                     
-                    langfuse_context.update_current_observation(
+                    self._obs(
                         level="WARNING",
                         output={"error": msg}
                     )
@@ -130,11 +289,9 @@ class ToolsFactory:
                     return {"error": msg}
             
             except Exception as e:
-                logger.error(f"   ❌ Tool error: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
+                logger.exception(f"   ❌ Tool error: {str(e)}")
                 
-                langfuse_context.update_current_observation(
+                self._obs(
                     level="ERROR",
                     output={"error": str(e)}
                 )
@@ -165,20 +322,24 @@ Returns: Dictionary with financial metrics including revenue, net_income, total_
         """
         
         @observe(name="search_10k_tool")
-        def search_10k(query: str, ticker: str, fiscal_year: int = None) -> dict:
+        def search_10k(
+            query: str,
+            ticker: Union[str, List[str]],
+            fiscal_year: Union[int, List[int]] = None
+        ) -> dict:
             """
             Search 10-K filings semantically for qualitative information
             
             Args:
                 query: Search query (e.g., "What are the main risk factors?")
-                ticker: Stock ticker (e.g., 'AAPL')
-                fiscal_year: Optional fiscal year to filter by
+                ticker: Stock ticker (e.g., 'AAPL'), or a list of tickers to search side by side
+                fiscal_year: Optional fiscal year (or list of years) to filter by
             
             Returns:
                 Dictionary with answer and sources
             """
             
-            langfuse_context.update_current_observation(
+            self._obs(
                 metadata={
                     "query": query[:100],
                     "ticker": ticker,
@@ -203,7 +364,7 @@ Returns: Dictionary with financial metrics including revenue, net_income, total_
                     self.agent.last_tool_sources = result.get('sources', [])
                     logger.info(f"   ✅ Stored {len(self.agent.last_tool_sources)} sources for citations")
                 
-                langfuse_context.update_current_observation(
+                self._obs(
                     output={"num_sources": result.get('num_sources', 0)},
                     metadata={"success": True}
                 )
@@ -213,7 +374,7 @@ Returns: Dictionary with financial metrics including revenue, net_income, total_
             except Exception as e:
                 logger.error(f"   ❌ Tool error: {str(e)}")
                 
-                langfuse_context.update_current_observation(
+                self._obs(
                     level="ERROR",
                     output={"error": str(e)}
                 )
@@ -235,6 +396,7 @@ Use this tool for questions about:
 Examples:
 - "What are Apple's main products?" → search_10k("main products", "AAPL")
 - "What risks does Microsoft face?" → search_10k("risk factors", "MSFT", 2023)
+- "How do Apple and Microsoft describe competition?" → search_10k("competition", ["AAPL", "MSFT"])
 
 Returns: Dictionary with answer and cited sources
 """
@@ -259,7 +421,7 @@ Returns: Dictionary with answer and cited sources
                 Dictionary with comparison results and winner
             """
             
-            langfuse_context.update_current_observation(
+            self._obs(
                 metadata={
                     "tickers": tickers,
                     "metric": metric,
@@ -270,43 +432,52 @@ Returns: Dictionary with answer and cited sources
             try:
                 logger.info(f"\n🔧 Tool: compare_companies({tickers}, '{metric}', {fiscal_year})")
                 
+                if metric not in COMPARABLE_METRICS:
+                    msg = f"Unknown metric '{metric}'. Available: {', '.join(sorted(COMPARABLE_METRICS))}"
+                    logger.warning(f"   ⚠️  {msg}")
+                    
+                    self._obs(
+                        level="WARNING",
+                        output={"error": msg}
+                    )
+                    
+                    return {"error": msg}
+                
                 results = []
+                value_by_ticker = {}
                 
+                # Companies already looked up this session come from the cache
                 for ticker in tickers:
-                    query = text("""
-                        SELECT structured_data 
-                        FROM filings f
-                        JOIN companies c ON f.company_id = c.id
-                        WHERE c.ticker = :ticker 
-                          AND f.fiscal_year = :year
-                          AND f.filing_type = '10-K'
-                    """)
-                    
-                    with self.db.engine.connect() as conn:
-                        result = conn.execute(query, {"ticker": ticker, "year": fiscal_year}).fetchone()
+                    data = self._cached_filing((ticker, fiscal_year, None))
+                    if data is not None:
+                        value_by_ticker[ticker] = data.get(metric)
+                
+                uncached = [ticker for ticker in tickers if ticker not in value_by_ticker]
+                if uncached:
+                    with self._connection() as conn:
+                        rows = conn.execute(
+                            _COMPARISON_QUERY,
+                            {"tickers": uncached, "year": fiscal_year, "metric": metric}
+                        ).fetchall()
+                    value_by_ticker.update(rows)
+                
+                # Keep the caller's ticker order (ties stay in that order after sorting)
+                for ticker in tickers:
+                    value = value_by_ticker.get(ticker)
                     
-                    if result and result[0]:
-                        # JSONB returns dict directly
-                        data = result[0]
-                        
-                        # Handle string case
-                        if isinstance(data, str):
-                            data = json.loads(data)
-                        
-                        value = data.get(metric)
-                        if value:
-                            results.append({
-                                "ticker": ticker,
-                                "metric": metric,
-                                "value": value,
-                                "year": fiscal_year
-                            })
+                    if value:
+                        results.append({
+                            "ticker": ticker,
+                            "metric": metric,
+                            "value": value,
+                            "year": fiscal_year
+                        })
                 
                 if not results:
                     msg = f"No data found for comparison"
                     logger.warning(f"   ⚠️  {msg}")
                     
-                    langfuse_context.update_current_observation(
+                    self._obs(
                         level="WARNING",
                         output={"error": msg}
                     )
@@ -325,7 +496,7 @@ Returns: Dictionary with answer and cited sources
                     "year": fiscal_year
                 }
                 
-                langfuse_context.update_current_observation(
+                self._obs(
                     output={"num_companies": len(results), "winner": results[0]['ticker']},
                     metadata={"success": True}
                 )
@@ -335,7 +506,7 @@ Returns: Dictionary with answer and cited sources
             except Exception as e:
                 logger.error(f"   ❌ Tool error: {str(e)}")
                 
-                langfuse_context.update_current_observation(
+                self._obs(
                     level="ERROR",
                     output={"error": str(e)}
                 )
@@ -0,0 +1,27 @@
+"""
+Tests for the RAG answer cache key
+"""
+
+import pytest
+
+rag_engine = pytest.importorskip("src.rag_engine")
+
+
+def test_questions_differing_only_by_year_do_not_share_a_cache_key():
+    first = rag_engine._question_discriminators("What was revenue in 2023?")
+    second = rag_engine._question_discriminators("What was revenue in 2022?")
+    
+    assert first == ("2023",)
+    assert second == ("2022",)
+    assert first != second
+
+
+def test_ticker_like_words_are_discriminators():
+    assert rag_engine._question_discriminators("How did AAPL and BRK.B do?") == ("AAPL", "BRK.B")
+
+
+def test_rephrasing_keeps_the_same_discriminators():
+    assert (
+        rag_engine._question_discriminators("What was  revenue in 2023?")
+        == rag_engine._question_discriminators("what was revenue in 2023")
+    )
@@ -0,0 +1,24 @@
+"""
+Tests for RAG query filter normalization
+"""
+
+import pytest
+
+rag_engine = pytest.importorskip("src.rag_engine")
+
+
+def test_fiscal_year_string_becomes_one_int_year():
+    assert rag_engine._as_fiscal_years("2023") == [2023]
+
+
+def test_fiscal_year_int_becomes_one_year():
+    assert rag_engine._as_fiscal_years(2023) == [2023]
+
+
+def test_fiscal_year_list_is_coerced_to_ints():
+    assert rag_engine._as_fiscal_years(["2022", 2023]) == [2022, 2023]
+
+
+def test_missing_fiscal_year_means_no_filter():
+    assert rag_engine._as_fiscal_years(None) is None
+    assert rag_engine._as_fiscal_years("") is None
@@ -0,0 +1,126 @@
+"""
+Tests for the streaming 10-K parser against the pre-refactor BeautifulSoup parser
+
+tests/legacy_structured_parser.py is the parser as it was before tables were
+streamed with lxml; both are run on the filings in tests/fixtures/.
+"""
+
+import dataclasses
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("bs4")
+
+from src.structured_parser import KeyMetrics, TenKStructuredExtractor, _iter_tables
+
+TESTS_DIR = Path(__file__).parent
+FIXTURES_DIR = TESTS_DIR / "fixtures"
+
+sys.path.insert(0, str(TESTS_DIR))
+import legacy_structured_parser  # noqa: E402
+
+
+def _parse(file_name: str):
+    """Run the current and the pre-refactor parser on one fixture"""
+    path = str(FIXTURES_DIR / file_name)
+    new = TenKStructuredExtractor().extract_all_years(path)
+    legacy = legacy_structured_parser.TenKStructuredExtractor().extract_all_years(path)
+    return new, legacy
+
+
+def test_matches_legacy_parser_on_sample_filing():
+    new, legacy = _parse("sample_10k.html")
+
+    assert len(new) == len(legacy) == 3
+
+    for new_year, legacy_year in zip(new, legacy):
+        assert new_year.metadata.model_dump() == legacy_year.metadata.model_dump()
+        assert dataclasses.asdict(new_year.key_metrics) == legacy_year.key_metrics.model_dump()
+
+
+def test_sample_filing_values():
+    new, _ = _parse("sample_10k.html")
+    latest = new[0]
+
+    assert latest.metadata.company_name == "EXAMPLE DEVICES INC"
+    assert latest.metadata.accession_number == "0000000001-24-000042"
+    assert latest.metadata.filing_date == datetime(2024, 11, 1)
+    assert [year.metadata.fiscal_year_end.year for year in new] == [2024, 2023, 2022]
+
+    # Consolidated figures win over the segment table; values are in millions
+    assert latest.key_metrics.revenue == 391_035e6
+    assert latest.key_metrics.operating_income == 123_216e6
+    assert latest.key_metrics.total_assets == 364_980e6
+    assert latest.key_metrics.operating_cash_flow == 118_254e6
+
+
+def test_mixed_header_styles_merge_by_year():
+    new, legacy = _parse("mixed_headers_10k.html")
+
+    # Year ends come from the income statement's full-date headers
+    assert [year.metadata.fiscal_year_end for year in new] == [
+        datetime(2024, 9, 28),
+        datetime(2023, 9, 30),
+        datetime(2022, 9, 24),
+    ]
+
+    # The legacy parser kept years per exact date, so tables headed "2024"
+    # never reached the September 28 column; anything it did find must match
+    for new_year, legacy_year in zip(new, legacy):
+        assert new_year.metadata.model_dump() == legacy_year.metadata.model_dump()
+        new_metrics = dataclasses.asdict(new_year.key_metrics)
+        for field, value in legacy_year.key_metrics.model_dump().items():
+            if value is not None:
+                assert new_metrics[field] == value
+
+    assert new[0].key_metrics.total_assets == 364_980e6
+    assert new[0].key_metrics.operating_cash_flow == 118_254e6
+
+
+def test_empty_filing_has_no_tables(tmp_path):
+    empty = tmp_path / "empty.html"
+    empty.write_text("")
+
+    assert list(_iter_tables(str(empty))) == []
+
+
+@pytest.mark.parametrize("text", [
+    "$416,161",
+    "(1,234)",
+    "1234.56",
+    "$ 93,736",
+    "—",
+    "",
+    "Net sales",
+    "(565",
+    "12 345",
+])
+def test_extract_number_matches_legacy(text):
+    new = TenKStructuredExtractor()._extract_number(text)
+    legacy = legacy_structured_parser.TenKStructuredExtractor()._extract_number(text)
+
+    assert new == legacy
+
+
+@pytest.mark.parametrize("cell_text, expected", [
+    ("September 28, 2024", datetime(2024, 9, 28)),
+    ("2024", datetime(2024, 9, 30)),
+    ("Years ended", None),
+])
+def test_header_fiscal_year_end(cell_text, expected):
+    assert TenKStructuredExtractor()._header_fiscal_year_end(cell_text, detect_dates=True) == expected
+
+
+def test_merge_metrics_prefers_consolidated_values():
+    extractor = TenKStructuredExtractor()
+    existing = KeyMetrics(revenue=100.0, net_income=10.0)
+
+    extractor._merge_metrics(existing, KeyMetrics(revenue=200.0, total_assets=50.0), is_consolidated=True)
+
+    assert existing.revenue == 200.0
+    assert existing.net_income == 10.0
+    assert existing.total_assets == 50.0